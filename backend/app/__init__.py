@@ -1,6 +1,9 @@
+import click
 from flask import Flask
+from sqlalchemy.exc import SQLAlchemyError
+from werkzeug.exceptions import HTTPException
 from config import config
-from app.extensions import init_app
+from app.extensions import init_app, db, cache
 
 def create_app(config_name='default'):
     """Application factory pattern"""
@@ -23,6 +26,17 @@ def create_app(config_name='default'):
     app.register_blueprint(expenses_bp, url_prefix='/api/expenses')
     app.register_blueprint(reminders_bp, url_prefix='/api/reminders')
 
+    # One-off maintenance commands
+    @app.cli.command('backfill-group-totals')
+    def backfill_group_totals():
+        """Recompute each group's stored expense total from its active expenses"""
+        from app.models.group import Group
+
+        group_ids = Group.refresh_all_total_expenses()
+        db.session.commit()
+        cache.invalidate_groups(group_ids)
+        click.echo(f'Updated expense totals for {len(group_ids)} group(s)')
+
     # Health check endpoint
     @app.route('/api/health')
     def health_check():
@@ -37,4 +51,26 @@ def create_app(config_name='default'):
     def internal_error(error):
         return {'error': 'Internal server error'}, 500
 
+    # Routes without their own try/except rely on these
+    @app.errorhandler(HTTPException)
+    def http_error(error):
+        return {'error': error.description}, error.code
+
+    @app.errorhandler(ValueError)
+    def value_error(error):
+        db.session.rollback()
+        return {'error': str(error)}, 400
+
+    @app.errorhandler(SQLAlchemyError)
+    def database_error(error):
+        db.session.rollback()
+        app.logger.exception('Database error')
+        return {'error': 'Internal server error'}, 500
+
+    @app.errorhandler(Exception)
+    def unhandled_error(error):
+        db.session.rollback()
+        app.logger.exception('Unhandled error')
+        return {'error': 'Internal server error'}, 500
+
     return app
@@ -1,8 +1,13 @@
+import orjson
+from flask.json.provider import JSONProvider
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
 from flask_jwt_extended import JWTManager
 from flask_cors import CORS
 from flask_bcrypt import Bcrypt
+from app.utils import orjson_dumps
+from app.services.cache import CacheService
+from app.services.sms_service import SMSService
 
 # Initialize extensions
 db = SQLAlchemy()
@@ -10,11 +15,30 @@ migrate = Migrate()
 jwt = JWTManager()
 cors = CORS()
 bcrypt = Bcrypt()
+cache = CacheService()
+
+class OrjsonProvider(JSONProvider):
+    """JSON provider backed by orjson (serializes datetimes natively)"""
+
+    def dumps(self, obj, **kwargs):
+        return orjson_dumps(obj).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(orjson_dumps(obj), mimetype='application/json')
 
 def init_app(app):
     """Initialize Flask extensions with app instance"""
+    app.json = OrjsonProvider(app)
     db.init_app(app)
     migrate.init_app(app, db)
     jwt.init_app(app)
     cors.init_app(app)
     bcrypt.init_app(app)
+    cache.init_app(app)
+
+    # One Twilio client per app, so its HTTP session (and TLS connection) is reused across requests
+    app.extensions['sms'] = SMSService()
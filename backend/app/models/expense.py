@@ -1,6 +1,8 @@
 from datetime import datetime
 from app.extensions import db
-from decimal import Decimal, ROUND_HALF_UP
+from decimal import Decimal
+from sqlalchemy.orm import selectinload
+from app.utils import allocate_cents, from_cents, split_cents_equally, to_cents
 
 class Expense(db.Model):
     __tablename__ = 'expenses'
@@ -34,59 +36,56 @@ class Expense(db.Model):
     created_by = db.relationship('User', foreign_keys=[created_by_id], back_populates='expenses_created')
     group = db.relationship('Group', back_populates='expenses')
     participants = db.relationship('ExpenseParticipant', back_populates='expense', 
-                                  cascade='all, delete-orphan', lazy='dynamic')
+                                  cascade='all, delete-orphan', lazy='select')
+    settlements = db.relationship('Settlement', back_populates='reference_expense', lazy='select')
+
+    # Index for the group expense listing (filter by group/active, newest first)
+    __table_args__ = (
+        db.Index('ix_expense_group_active_date', 'group_id', 'is_active', expense_date.desc()),
+    )
 
     def add_participants(self, participants_data):
         """
         Add participants to the expense
         participants_data: [{'user_id': 1, 'amount_owed': 10.00}, ...]
         """
-        # Clear existing participants
-        self.participants.delete()
-
-        total_owed = Decimal('0')
-
-        for participant_data in participants_data:
-            participant = ExpenseParticipant(
-                expense_id=self.id,
-                user_id=participant_data['user_id'],
-                amount_owed=Decimal(str(participant_data['amount_owed']))
-            )
-            db.session.add(participant)
-            total_owed += participant.amount_owed
+        rows = [
+            {
+                'expense_id': self.id,
+                'user_id': participant_data['user_id'],
+                'amount_owed': Decimal(str(participant_data['amount_owed'])),
+                'is_settled': False
+            }
+            for participant_data in participants_data
+        ]
+        total_owed = sum((row['amount_owed'] for row in rows), Decimal('0'))
 
         # Validate that total owed matches expense amount
         if abs(total_owed - Decimal(str(self.amount))) > Decimal('0.01'):  # Allow 1 cent tolerance
             raise ValueError(f"Total owed ({total_owed}) doesn't match expense amount ({self.amount})")
 
-        db.session.commit()
+        # Replace existing participants in the caller's transaction: one DELETE, one executemany
+        db.session.execute(
+            db.delete(ExpenseParticipant).where(ExpenseParticipant.expense_id == self.id)
+        )
+        if rows:
+            db.session.execute(db.insert(ExpenseParticipant), rows)
+
+        # Any already-loaded collection is stale now
+        db.session.expire(self, ['participants'])
 
     def split_equally(self, user_ids):
         """Split the expense equally among specified users"""
         if not user_ids:
             raise ValueError("No users specified for splitting")
 
-        amount_per_person = Decimal(str(self.amount)) / len(user_ids)
-        # Round to 2 decimal places
-        amount_per_person = amount_per_person.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
-
-        participants_data = []
-        total_assigned = Decimal('0')
-
-        # Assign equal amounts to all but the last person
-        for i, user_id in enumerate(user_ids[:-1]):
-            participants_data.append({
-                'user_id': user_id,
-                'amount_owed': float(amount_per_person)
-            })
-            total_assigned += amount_per_person
+        # Work in integer cents; the first `remainder` users absorb one extra cent each
+        shares = split_cents_equally(to_cents(self.amount), len(user_ids))
 
-        # The last person gets the remainder to ensure exact total
-        last_person_amount = Decimal(str(self.amount)) - total_assigned
-        participants_data.append({
-            'user_id': user_ids[-1],
-            'amount_owed': float(last_person_amount)
-        })
+        participants_data = [
+            {'user_id': user_id, 'amount_owed': from_cents(share)}
+            for user_id, share in zip(user_ids, shares)
+        ]
 
         self.split_method = 'equal'
         self.add_participants(participants_data)
@@ -117,48 +116,69 @@ class Expense(db.Model):
         if abs(total_percentage - 100) > 0.01:  # Allow small tolerance
             raise ValueError(f"Percentages ({total_percentage}) don't sum to 100")
 
-        participants_data = []
-        total_assigned = Decimal('0')
-        expense_amount = Decimal(str(self.amount))
-
-        # Calculate amounts for all but the last person
-        users = list(percentages_dict.keys())
-        for user_id in users[:-1]:
-            percentage = Decimal(str(percentages_dict[user_id]))
-            amount = (expense_amount * percentage / 100).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
-            participants_data.append({
-                'user_id': user_id,
-                'amount_owed': float(amount)
-            })
-            total_assigned += amount
-
-        # Last person gets the remainder
-        last_person_amount = expense_amount - total_assigned
-        participants_data.append({
-            'user_id': users[-1],
-            'amount_owed': float(last_person_amount)
-        })
+        # Allocate integer cents by hundredths of a percent (largest remainder, exact total)
+        user_ids = list(percentages_dict.keys())
+        basis_points = [to_cents(percentages_dict[user_id]) for user_id in user_ids]
+        shares = allocate_cents(to_cents(self.amount), basis_points)
+
+        participants_data = [
+            {'user_id': user_id, 'amount_owed': from_cents(share)}
+            for user_id, share in zip(user_ids, shares)
+        ]
 
         self.split_method = 'percentage'
         self.add_participants(participants_data)
 
-    def get_participant_summary(self):
+    def has_settled_participants(self):
+        """Check whether anyone has settled their share, without loading participants"""
+        return db.session.execute(
+            db.select(
+                db.select(ExpenseParticipant.id).where(
+                    ExpenseParticipant.expense_id == self.id,
+                    ExpenseParticipant.is_settled == True
+                ).exists()
+            )
+        ).scalar()
+
+    def get_participant_summary(self, participants=None):
         """Get summary of all participants and their owed amounts"""
+        if participants is None:
+            participants = self.participants
         return [
             {
                 'user': participant.user.to_dict(),
                 'amount_owed': float(participant.amount_owed),
                 'is_settled': participant.is_settled
             }
-            for participant in self.participants
+            for participant in participants
         ]
 
-    def is_fully_settled(self):
+    def is_fully_settled(self, participants=None):
         """Check if all participants have settled their amounts"""
-        return all(participant.is_settled for participant in self.participants)
+        if participants is None:
+            participants = self.participants
+        return all(participant.is_settled for participant in participants)
+
+    def to_dict(self, include_participants=True, participants=None):
+        """
+        Convert expense to dictionary
+        participants: preloaded ExpenseParticipant rows, defaults to the participants collection
+        """
+        if participants is None:
+            participants = self.participants
+
+        # Settlement status and participant summary in a single pass
+        is_fully_settled = True
+        summary = []
+        for participant in participants:
+            is_fully_settled = is_fully_settled and participant.is_settled
+            if include_participants:
+                summary.append({
+                    'user': participant.user.to_dict(),
+                    'amount_owed': float(participant.amount_owed),
+                    'is_settled': participant.is_settled
+                })
 
-    def to_dict(self, include_participants=True):
-        """Convert expense to dictionary"""
         data = {
             'id': self.id,
             'title': self.title,
@@ -171,17 +191,37 @@ class Expense(db.Model):
             'created_by_id': self.created_by_id,
             'split_method': self.split_method,
             'is_active': self.is_active,
-            'expense_date': self.expense_date.isoformat(),
-            'created_at': self.created_at.isoformat(),
-            'updated_at': self.updated_at.isoformat(),
-            'is_fully_settled': self.is_fully_settled()
+            'expense_date': self.expense_date,
+            'created_at': self.created_at,
+            'updated_at': self.updated_at,
+            'is_fully_settled': is_fully_settled
         }
 
         if include_participants:
-            data['participants'] = self.get_participant_summary()
+            data['participants'] = summary
 
         return data
 
+    @classmethod
+    def to_dict_many(cls, expenses, include_participants=True):
+        """Convert a batch of expenses to dictionaries, loading all participants in one query"""
+        participants_by_expense = {expense.id: [] for expense in expenses}
+
+        if participants_by_expense:
+            participants = ExpenseParticipant.query.options(
+                selectinload(ExpenseParticipant.user)
+            ).filter(
+                ExpenseParticipant.expense_id.in_(participants_by_expense)
+            ).all()
+
+            for participant in participants:
+                participants_by_expense[participant.expense_id].append(participant)
+
+        return [
+            expense.to_dict(include_participants, participants_by_expense[expense.id])
+            for expense in expenses
+        ]
+
     def __repr__(self):
         return f'<Expense {self.title}: ${self.amount}>'
 
@@ -200,14 +240,16 @@ class ExpenseParticipant(db.Model):
     expense = db.relationship('Expense', back_populates='participants')
     user = db.relationship('User', back_populates='expense_participations')
 
-    # Unique constraint
-    __table_args__ = (db.UniqueConstraint('expense_id', 'user_id', name='unique_expense_participation'),)
+    # Unique constraint and index for per-user unsettled lookups
+    __table_args__ = (
+        db.UniqueConstraint('expense_id', 'user_id', name='unique_expense_participation'),
+        db.Index('ix_ep_user_settled', 'user_id', 'is_settled'),
+    )
 
     def mark_as_settled(self):
         """Mark this participant's amount as settled"""
         self.is_settled = True
         self.settled_at = datetime.utcnow()
-        db.session.commit()
 
     def to_dict(self):
         return {
@@ -216,7 +258,7 @@ class ExpenseParticipant(db.Model):
             'user_id': self.user_id,
             'amount_owed': float(self.amount_owed),
             'is_settled': self.is_settled,
-            'settled_at': self.settled_at.isoformat() if self.settled_at else None
+            'settled_at': self.settled_at
         }
 
     def __repr__(self):
@@ -1,5 +1,7 @@
 from datetime import datetime
+from functools import cached_property
 from app.extensions import db
+from app.utils import from_cents
 
 class Group(db.Model):
     __tablename__ = 'groups'
@@ -12,16 +14,29 @@ class Group(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+    # Denormalized sum of active expense amounts, maintained on every expense write
+    total_expenses_cents = db.Column(db.BigInteger, nullable=False, default=0, server_default='0')
+
     # Relationships
     created_by = db.relationship('User', backref='groups_created')
-    memberships = db.relationship('GroupMembership', back_populates='group', lazy='dynamic', 
+    memberships = db.relationship('GroupMembership', back_populates='group', lazy='select',
                                  cascade='all, delete-orphan')
-    expenses = db.relationship('Expense', back_populates='group', lazy='dynamic',
+    expenses = db.relationship('Expense', back_populates='group', lazy='select',
                               cascade='all, delete-orphan')
+    settlements = db.relationship('Settlement', back_populates='group', lazy='select')
+
+    @cached_property
+    def active_members(self):
+        """Active member Users, queried once per instance (i.e. once per request)"""
+        from .user import User
+        return User.query.join(GroupMembership, GroupMembership.user_id == User.id).filter(
+            GroupMembership.group_id == self.id,
+            GroupMembership.is_active == True
+        ).all()
 
     def get_members(self):
         """Get all active members of the group"""
-        return [membership.user for membership in self.memberships if membership.is_active]
+        return self.active_members
 
     def add_member(self, user, role='member'):
         """Add a member to the group"""
@@ -40,7 +55,7 @@ class Group(db.Model):
             )
             db.session.add(membership)
 
-        db.session.commit()
+        self.__dict__.pop('active_members', None)
 
     def remove_member(self, user):
         """Remove a member from the group"""
@@ -50,14 +65,53 @@ class Group(db.Model):
 
         if membership:
             membership.is_active = False
-            db.session.commit()
+            self.__dict__.pop('active_members', None)
 
     def get_total_expenses(self):
         """Get total amount of all expenses in the group"""
-        return sum(expense.amount for expense in self.expenses if expense.is_active)
+        return from_cents(self.total_expenses_cents or 0)
+
+    @classmethod
+    def adjust_total_expenses(cls, group_id, delta_cents):
+        """Apply an expense amount change to the denormalized total in one atomic UPDATE"""
+        if not delta_cents:
+            return
+
+        db.session.execute(
+            db.update(cls).where(cls.id == group_id).values(
+                total_expenses_cents=cls.total_expenses_cents + delta_cents,
+                updated_at=cls.updated_at  # Expense writes don't count as group edits
+            )
+        )
+
+    @classmethod
+    def refresh_all_total_expenses(cls):
+        """
+        Recompute every group's denormalized total in one UPDATE (backfill/repair)
+        Returns the IDs of the groups whose total changed; the caller commits
+        """
+        from .expense import Expense
+        total_cents = db.cast(
+            db.select(db.func.coalesce(db.func.sum(Expense.amount), 0) * 100)
+            .where(Expense.group_id == cls.id, Expense.is_active == True)
+            .scalar_subquery(),
+            db.BigInteger
+        )
+
+        return db.session.execute(
+            db.update(cls)
+            .where(cls.total_expenses_cents.is_distinct_from(total_cents))
+            .values(
+                total_expenses_cents=total_cents,
+                updated_at=cls.updated_at  # A backfill is not a group edit
+            )
+            .returning(cls.id)
+        ).scalars().all()
 
     def get_member_balances(self):
         """Get balance summary for all members"""
+        from .expense import Expense, ExpenseParticipant
+
         members = self.get_members()
         balances = {}
 
@@ -69,17 +123,27 @@ class Group(db.Model):
                 'net_balance': 0
             }
 
-        # Calculate from all active expenses
-        for expense in self.expenses:
-            if expense.is_active:
-                # Add to paid amount for person who paid
-                if expense.paid_by_id in balances:
-                    balances[expense.paid_by_id]['total_paid'] += expense.amount
+        # Aggregate paid and owed amounts from all active expenses in the database
+        paid_rows = db.session.execute(
+            db.select(Expense.paid_by_id, db.func.sum(Expense.amount))
+            .where(Expense.group_id == self.id, Expense.is_active == True)
+            .group_by(Expense.paid_by_id)
+        ).all()
+
+        owed_rows = db.session.execute(
+            db.select(ExpenseParticipant.user_id, db.func.sum(ExpenseParticipant.amount_owed))
+            .join(Expense, Expense.id == ExpenseParticipant.expense_id)
+            .where(Expense.group_id == self.id, Expense.is_active == True)
+            .group_by(ExpenseParticipant.user_id)
+        ).all()
+
+        for user_id, total_paid in paid_rows:
+            if user_id in balances:
+                balances[user_id]['total_paid'] = total_paid
 
-                # Add to owed amounts for all participants
-                for participant in expense.participants:
-                    if participant.user_id in balances:
-                        balances[participant.user_id]['total_owed'] += participant.amount_owed
+        for user_id, total_owed in owed_rows:
+            if user_id in balances:
+                balances[user_id]['total_owed'] = total_owed
 
         # Calculate net balances
         for user_id in balances:
@@ -89,28 +153,62 @@ class Group(db.Model):
 
         return balances
 
-    def to_dict(self, include_members=False, include_balances=False):
-        """Convert group to dictionary"""
+    def to_dict(self, include_members=False, include_balances=False, members=None):
+        """
+        Convert group to dictionary
+        members: preloaded list of active member Users, queried when omitted
+        """
+        if members is None and include_members:
+            members = self.get_members()
+
         data = {
             'id': self.id,
             'name': self.name,
             'description': self.description,
             'created_by_id': self.created_by_id,
             'is_active': self.is_active,
-            'created_at': self.created_at.isoformat(),
-            'updated_at': self.updated_at.isoformat(),
+            'created_at': self.created_at,
+            'updated_at': self.updated_at,
             'total_expenses': self.get_total_expenses(),
-            'member_count': self.memberships.filter_by(is_active=True).count()
+            'member_count': (
+                len(members) if members is not None
+                else sum(1 for membership in self.memberships if membership.is_active)
+            )
         }
 
         if include_members:
-            data['members'] = [member.to_dict() for member in self.get_members()]
+            data['members'] = [member.to_dict() for member in members]
 
         if include_balances:
             data['member_balances'] = self.get_member_balances()
 
         return data
 
+    @classmethod
+    def to_dict_many(cls, groups, include_members=False):
+        """Convert a batch of groups to dictionaries, loading all active members in one query"""
+        from .user import User
+
+        members_by_group = {group.id: [] for group in groups}
+
+        if members_by_group:
+            rows = db.session.execute(
+                db.select(GroupMembership.group_id, User)
+                .join(User, User.id == GroupMembership.user_id)
+                .where(
+                    GroupMembership.group_id.in_(members_by_group),
+                    GroupMembership.is_active == True
+                )
+            ).all()
+
+            for group_id, user in rows:
+                members_by_group[group_id].append(user)
+
+        return [
+            group.to_dict(include_members=include_members, members=members_by_group[group.id])
+            for group in groups
+        ]
+
     def __repr__(self):
         return f'<Group {self.name}>'
 
@@ -129,8 +227,12 @@ class GroupMembership(db.Model):
     group = db.relationship('Group', back_populates='memberships')
     user = db.relationship('User', back_populates='group_memberships')
 
-    # Unique constraint
-    __table_args__ = (db.UniqueConstraint('group_id', 'user_id', name='unique_group_membership'),)
+    # Unique constraint (which also serves membership guards) and indexes for "my groups" and admin lookups
+    __table_args__ = (
+        db.UniqueConstraint('group_id', 'user_id', name='unique_group_membership'),
+        db.Index('ix_gm_user_active', 'user_id', 'is_active'),
+        db.Index('ix_gm_group_role_active', 'group_id', 'role', 'is_active'),
+    )
 
     def to_dict(self):
         return {
@@ -139,7 +241,7 @@ class GroupMembership(db.Model):
             'user_id': self.user_id,
             'role': self.role,
             'is_active': self.is_active,
-            'joined_at': self.joined_at.isoformat()
+            'joined_at': self.joined_at
         }
 
     def __repr__(self):
@@ -1,6 +1,7 @@
 from datetime import datetime
 from app.extensions import db
 from decimal import Decimal
+from sqlalchemy.orm import selectinload
 
 class Settlement(db.Model):
     __tablename__ = 'settlements'
@@ -31,18 +32,26 @@ class Settlement(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     confirmed_at = db.Column(db.DateTime, nullable=True)
 
-    # Relationships
-    from_user = db.relationship('User', foreign_keys=[from_user_id], back_populates='settlements_from')
-    to_user = db.relationship('User', foreign_keys=[to_user_id], back_populates='settlements_to')
-    group = db.relationship('Group', backref='settlements')
-    reference_expense = db.relationship('Expense', backref='settlements')
+    # Relationships (both users are serialized by to_dict, so they are joined in;
+    # group and reference_expense are never needed there and must not lazy-load)
+    from_user = db.relationship('User', foreign_keys=[from_user_id], back_populates='settlements_from',
+                                lazy='joined')
+    to_user = db.relationship('User', foreign_keys=[to_user_id], back_populates='settlements_to',
+                              lazy='joined')
+    group = db.relationship('Group', back_populates='settlements', lazy='raise')
+    reference_expense = db.relationship('Expense', back_populates='settlements', lazy='raise')
+
+    # Indexes for per-user settlement summaries and listings, in each direction
+    __table_args__ = (
+        db.Index('ix_settle_from_conf', 'from_user_id', 'is_confirmed'),
+        db.Index('ix_settle_to_conf', 'to_user_id', 'is_confirmed'),
+    )
 
     def confirm_settlement(self, confirmed_by_user_id=None):
         """Confirm the settlement"""
         self.is_confirmed = True
         self.status = 'confirmed'
         self.confirmed_at = datetime.utcnow()
-        db.session.commit()
 
         # Update related expense participants if this settlement is for a specific expense
         if self.reference_expense_id:
@@ -60,7 +69,6 @@ class Settlement(db.Model):
         self.status = 'disputed'
         if reason:
             self.description = f"{self.description or ''} [DISPUTED: {reason}]"
-        db.session.commit()
 
     @classmethod
     def create_settlement(cls, from_user_id, to_user_id, amount, **kwargs):
@@ -82,31 +90,87 @@ class Settlement(db.Model):
         )
 
         db.session.add(settlement)
-        db.session.commit()
+        db.session.flush()  # Assign the settlement ID; the caller commits
         return settlement
 
+    @classmethod
+    def create_settlements_bulk(cls, settlements_data):
+        """
+        Validate and insert many settlements in one executemany INSERT
+        settlements_data: [{'from_user_id': 1, 'to_user_id': 2, 'amount': 10.00, ...}, ...]
+        Returns the new settlement IDs in input order; the caller commits
+        """
+        now = datetime.utcnow()
+        rows = []
+
+        # Validate everything before writing anything
+        for data in settlements_data:
+            if data['from_user_id'] == data['to_user_id']:
+                raise ValueError("Cannot create settlement between same user")
+
+            amount = Decimal(str(data['amount']))
+            if amount <= 0:
+                raise ValueError("Settlement amount must be positive")
+
+            # Only known columns, and the same keys on every row, so the executemany INSERT compiles
+            rows.append({
+                'from_user_id': data['from_user_id'],
+                'to_user_id': data['to_user_id'],
+                'amount': amount,
+                'group_id': data.get('group_id'),
+                'description': data.get('description'),
+                'reference_expense_id': data.get('reference_expense_id'),
+                'payment_method': data.get('payment_method') or 'cash',
+                'settlement_date': data.get('settlement_date') or now
+            })
+
+        if not rows:
+            return []
+
+        return db.session.scalars(db.insert(cls).returning(cls.id, sort_by_parameter_order=True), rows).all()
+
     @classmethod
     def get_user_settlement_summary(cls, user_id):
         """Get settlement summary for a user"""
-        # Settlements where user owes money (from_user)
-        outgoing = cls.query.filter_by(from_user_id=user_id, is_confirmed=True).all()
-        outgoing_total = sum(float(s.amount) for s in outgoing)
-
-        # Settlements where user should receive money (to_user)
-        incoming = cls.query.filter_by(to_user_id=user_id, is_confirmed=True).all()
-        incoming_total = sum(float(s.amount) for s in incoming)
-
-        # Pending settlements
-        pending_outgoing = cls.query.filter_by(from_user_id=user_id, is_confirmed=False).all()
-        pending_incoming = cls.query.filter_by(to_user_id=user_id, is_confirmed=False).all()
+        def confirmed_sum(condition):
+            return db.func.coalesce(db.func.sum(
+                db.case((db.and_(condition, cls.is_confirmed == True), cls.amount), else_=0)
+            ), 0)
+
+        def pending_count(condition):
+            return db.func.coalesce(db.func.sum(
+                db.case((db.and_(condition, cls.is_confirmed == False), 1), else_=0)
+            ), 0)
+
+        # Confirmed totals and pending counts as conditional aggregates in a single row
+        outgoing_total, incoming_total, pending_outgoing, pending_incoming = db.session.execute(
+            db.select(
+                confirmed_sum(cls.from_user_id == user_id),  # Settlements where user owes money
+                confirmed_sum(cls.to_user_id == user_id),  # Settlements where user should receive money
+                pending_count(cls.from_user_id == user_id),
+                pending_count(cls.to_user_id == user_id)
+            ).where(db.or_(cls.from_user_id == user_id, cls.to_user_id == user_id))
+        ).one()
+
+        outgoing_total = float(outgoing_total)
+        incoming_total = float(incoming_total)
+
+        # Most recent confirmed settlements, with both users loaded up front
+        recent = cls.query.options(
+            selectinload(cls.from_user),
+            selectinload(cls.to_user)
+        ).filter(
+            db.or_(cls.from_user_id == user_id, cls.to_user_id == user_id),
+            cls.is_confirmed == True
+        ).order_by(cls.created_at.desc()).limit(10).all()
 
         return {
             'total_paid': outgoing_total,
             'total_received': incoming_total,
             'net_balance': incoming_total - outgoing_total,
-            'pending_outgoing': len(pending_outgoing),
-            'pending_incoming': len(pending_incoming),
-            'recent_settlements': [s.to_dict() for s in (outgoing + incoming)[-10:]]  # Last 10
+            'pending_outgoing': int(pending_outgoing),
+            'pending_incoming': int(pending_incoming),
+            'recent_settlements': [s.to_dict() for s in recent]  # Last 10
         }
 
     def to_dict(self):
@@ -124,9 +188,9 @@ class Settlement(db.Model):
             'payment_method': self.payment_method,
             'status': self.status,
             'is_confirmed': self.is_confirmed,
-            'settlement_date': self.settlement_date.isoformat(),
-            'created_at': self.created_at.isoformat(),
-            'confirmed_at': self.confirmed_at.isoformat() if self.confirmed_at else None
+            'settlement_date': self.settlement_date,
+            'created_at': self.created_at,
+            'confirmed_at': self.confirmed_at
         }
 
     def __repr__(self):
@@ -1,7 +1,15 @@
 from datetime import datetime
+from functools import lru_cache
+from flask import current_app
+from sqlalchemy.orm import selectinload, validates
 from app.extensions import db, bcrypt
 from flask_jwt_extended import create_access_token, create_refresh_token
 
+@lru_cache(maxsize=4)
+def _dummy_password_hash(rounds):
+    """A throwaway bcrypt hash at the given cost, generated once per cost"""
+    return bcrypt.generate_password_hash('not-a-real-password', rounds).decode('utf-8')
+
 class User(db.Model):
     __tablename__ = 'users'
 
@@ -24,6 +32,11 @@ class User(db.Model):
     settlements_to = db.relationship('Settlement', foreign_keys='Settlement.to_user_id', 
                                    back_populates='to_user', lazy='dynamic')
 
+    @validates('email')
+    def normalize_email(self, key, email):
+        """Store emails lowercased so exact lookups on the email index are case-insensitive"""
+        return email.lower().strip() if email else email
+
     def set_password(self, password):
         """Hash and set password"""
         self.password_hash = bcrypt.generate_password_hash(password).decode('utf-8')
@@ -32,6 +45,27 @@ class User(db.Model):
         """Check if password matches hash"""
         return bcrypt.check_password_hash(self.password_hash, password)
 
+    @staticmethod
+    def check_dummy_password(password):
+        """
+        Spend the same bcrypt work as check_password when no user matched, so
+        login timing doesn't reveal whether an email is registered
+        """
+        rounds = current_app.config.get('BCRYPT_LOG_ROUNDS', 12)
+        bcrypt.check_password_hash(_dummy_password_hash(rounds), password)
+        return False
+
+    def password_needs_rehash(self):
+        """
+        Check if the stored hash uses a lower bcrypt cost than configured
+        Stronger existing hashes are kept, so lowering BCRYPT_LOG_ROUNDS never weakens stored passwords
+        """
+        try:
+            rounds = int(self.password_hash.split('$')[2])
+        except (IndexError, ValueError):
+            return True
+        return rounds < current_app.config.get('BCRYPT_LOG_ROUNDS', 12)
+
     def generate_tokens(self):
         """Generate JWT access and refresh tokens"""
         access_token = create_access_token(identity=self.id)
@@ -42,37 +76,36 @@ class User(db.Model):
         }
 
     def get_groups(self):
-        """Get all groups user belongs to"""
-        return [membership.group for membership in self.group_memberships if membership.is_active]
+        """Get all groups user belongs to, with their memberships loaded for to_dict's member count"""
+        from .group import Group, GroupMembership
+        memberships = self.group_memberships.filter_by(is_active=True).options(
+            selectinload(GroupMembership.group).selectinload(Group.memberships)
+        ).all()
+        return [membership.group for membership in memberships]
 
     def get_balance_with_user(self, other_user_id):
         """Calculate balance between this user and another user across all groups"""
-        # This is a simplified version - in production, you'd want to optimize this query
-        total_balance = 0
-
-        # Get all expenses involving both users
         from .expense import ExpenseParticipant
-        participations = ExpenseParticipant.query.join(Expense).filter(
-            db.or_(
-                db.and_(ExpenseParticipant.user_id == self.id, 
-                       ExpenseParticipant.query.join(Expense).join(ExpenseParticipant, 
-                                                                  ExpenseParticipant.expense_id == Expense.id).filter(
-                           ExpenseParticipant.user_id == other_user_id).exists()),
-                db.and_(ExpenseParticipant.user_id == other_user_id,
-                       ExpenseParticipant.query.join(Expense).join(ExpenseParticipant,
-                                                                  ExpenseParticipant.expense_id == Expense.id).filter(
-                           ExpenseParticipant.user_id == self.id).exists())
-            )
-        ).all()
 
-        # Calculate net balance (simplified - would need more complex calculation for real app)
-        for participation in participations:
-            if participation.user_id == self.id:
-                total_balance += participation.amount_owed
-            else:
-                total_balance -= participation.amount_owed
+        # Expenses that both users participate in
+        shared_expense_ids = db.select(ExpenseParticipant.expense_id).where(
+            ExpenseParticipant.user_id == self.id
+        ).intersect(
+            db.select(ExpenseParticipant.expense_id).where(
+                ExpenseParticipant.user_id == other_user_id
+            )
+        )
 
-        return total_balance
+        # Net balance (simplified - would need more complex calculation for real app)
+        return db.session.execute(
+            db.select(db.func.coalesce(db.func.sum(db.case(
+                (ExpenseParticipant.user_id == self.id, ExpenseParticipant.amount_owed),
+                else_=-ExpenseParticipant.amount_owed
+            )), 0)).where(
+                ExpenseParticipant.expense_id.in_(shared_expense_ids),
+                ExpenseParticipant.user_id.in_([self.id, other_user_id])
+            )
+        ).scalar()
 
     def to_dict(self, include_sensitive=False):
         """Convert user to dictionary"""
@@ -82,8 +115,8 @@ class User(db.Model):
             'phone_number': self.phone_number,
             'full_name': self.full_name,
             'is_active': self.is_active,
-            'created_at': self.created_at.isoformat(),
-            'updated_at': self.updated_at.isoformat()
+            'created_at': self.created_at,
+            'updated_at': self.updated_at
         }
 
         if include_sensitive:
@@ -1,16 +1,69 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, g
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from app.extensions import db
+from app.extensions import db, cache
 from app.models.user import User
 from app.models.group import Group, GroupMembership
 from app.models.expense import Expense, ExpenseParticipant
 from app.models.settlement import Settlement
+from app.utils import parse_iso_datetime, to_cents
 from datetime import datetime, timedelta
 from decimal import Decimal
+from sqlalchemy.orm import selectinload
 import re
 
 expenses_bp = Blueprint('expenses', __name__)
 
+def _current_membership(group_id):
+    """Get the current user's active membership in a group, cached for the request"""
+    memberships = g.setdefault('memberships', {})
+    key = (get_jwt_identity(), group_id)
+
+    if key not in memberships:
+        memberships[key] = GroupMembership.query.filter_by(
+            group_id=group_id,
+            user_id=key[0],
+            is_active=True
+        ).first()
+
+    return memberships[key]
+
+def _get_expense_with_membership(expense_id):
+    """
+    Load an active expense and the current user's membership in its group in one query
+    Returns (expense, membership); expense is None if not found, membership if not a member
+    """
+    current_user_id = get_jwt_identity()
+    row = db.session.execute(
+        db.select(Expense, GroupMembership)
+        .outerjoin(GroupMembership, db.and_(
+            GroupMembership.group_id == Expense.group_id,
+            GroupMembership.user_id == current_user_id,
+            GroupMembership.is_active == True
+        ))
+        .where(Expense.id == expense_id, Expense.is_active == True)
+    ).first()
+
+    if row is None:
+        return None, None
+
+    expense, membership = row
+    g.setdefault('memberships', {})[(current_user_id, expense.group_id)] = membership
+    return expense, membership
+
+def _expense_response(expense):
+    """Serialize a written expense; full details only when requested with ?include=full"""
+    if request.args.get('include') == 'full':
+        return expense.to_dict()
+
+    return {
+        'id': expense.id,
+        'group_id': expense.group_id,
+        'amount': float(expense.amount)
+    }
+
+# Upper bound on expenses serialized per page
+MAX_PER_PAGE = 100
+
 def validate_expense_data(data):
     """Validate expense data"""
     errors = []
@@ -18,15 +71,15 @@ def validate_expense_data(data):
     if not data.get('title'):
         errors.append('Title is required')
 
-    if not data.get('amount'):
+    amount = data.get('amount')
+    if not amount:
         errors.append('Amount is required')
-
-    try:
-        amount = float(data['amount'])
-        if amount <= 0:
-            errors.append('Amount must be positive')
-    except (ValueError, TypeError):
-        errors.append('Invalid amount format')
+    else:
+        try:
+            if float(amount) <= 0:
+                errors.append('Amount must be positive')
+        except (ValueError, TypeError):
+            errors.append('Invalid amount format')
 
     if not data.get('group_id'):
         errors.append('Group ID is required')
@@ -34,386 +87,369 @@ def validate_expense_data(data):
     if not data.get('paid_by_id'):
         errors.append('Paid by user ID is required')
 
-    split_method = data.get('split_method', 'equal')
-    if split_method not in ['equal', 'exact', 'percentage']:
+    if data.get('split_method', 'equal') not in SPLIT_HANDLERS:
         errors.append('Invalid split method')
 
     return errors
 
+def _validate_member_values(values, active_member_ids, value_name, field_name):
+    """
+    Convert {user_id_str: value} to {user_id: float}, checking group membership
+    Returns (validated_values, error_response)
+    """
+    validated = {}
+    for user_id_str, value in values.items():
+        try:
+            user_id = int(user_id_str)
+            validated[user_id] = float(value)
+        except (ValueError, TypeError):
+            return None, (jsonify({'error': f'Invalid user ID or {value_name} in {field_name}'}), 400)
+
+        # Verify user is group member
+        if user_id not in active_member_ids:
+            return None, (jsonify({'error': f'User {user_id} is not a member of this group'}), 400)
+
+    return validated, None
+
+def _split_equal(expense, data, active_member_ids):
+    """Apply an equal split; returns an error response or None"""
+    participant_ids = data.get('participant_ids', [])
+    if not participant_ids:
+        return jsonify({'error': 'Participant IDs required for equal split'}), 400
+
+    # Verify all participants are group members
+    for user_id in participant_ids:
+        if user_id not in active_member_ids:
+            return jsonify({'error': f'User {user_id} is not a member of this group'}), 400
+
+    expense.split_equally(participant_ids)
+
+def _split_exact(expense, data, active_member_ids):
+    """Apply an exact-amount split; returns an error response or None"""
+    exact_amounts = data.get('exact_amounts', {})
+    if not exact_amounts:
+        return jsonify({'error': 'Exact amounts required for exact split'}), 400
+
+    validated_amounts, error_response = _validate_member_values(
+        exact_amounts, active_member_ids, 'amount', 'exact_amounts'
+    )
+    if error_response:
+        return error_response
+
+    expense.split_by_exact_amounts(validated_amounts)
+
+def _split_percentage(expense, data, active_member_ids):
+    """Apply a percentage split; returns an error response or None"""
+    percentages = data.get('percentages', {})
+    if not percentages:
+        return jsonify({'error': 'Percentages required for percentage split'}), 400
+
+    validated_percentages, error_response = _validate_member_values(
+        percentages, active_member_ids, 'percentage', 'percentages'
+    )
+    if error_response:
+        return error_response
+
+    expense.split_by_percentages(validated_percentages)
+
+SPLIT_HANDLERS = {
+    'equal': _split_equal,
+    'exact': _split_exact,
+    'percentage': _split_percentage,
+}
+
 @expenses_bp.route('', methods=['POST'])
 @jwt_required()
 def create_expense():
     """Create a new expense"""
-    try:
-        current_user_id = get_jwt_identity()
-        data = request.get_json()
-
-        # Validate expense data
-        errors = validate_expense_data(data)
-        if errors:
-            return jsonify({'errors': errors}), 400
+    current_user_id = get_jwt_identity()
+    data = request.get_json()
 
-        group_id = data['group_id']
+    # Validate expense data
+    errors = validate_expense_data(data)
+    if errors:
+        return jsonify({'errors': errors}), 400
 
-        # Verify user is a member of this group
-        membership = GroupMembership.query.filter_by(
-            group_id=group_id,
-            user_id=current_user_id,
-            is_active=True
-        ).first()
-
-        if not membership:
-            return jsonify({'error': 'Group not found or access denied'}), 404
-
-        # Verify paid_by user is also a group member
-        paid_by_membership = GroupMembership.query.filter_by(
-            group_id=group_id,
-            user_id=data['paid_by_id'],
-            is_active=True
-        ).first()
-
-        if not paid_by_membership:
-            return jsonify({'error': 'Paid by user is not a member of this group'}), 400
+    group_id = data['group_id']
+    split_method = data.get('split_method', 'equal')
 
-        # Parse expense date
-        expense_date = datetime.utcnow()
-        if data.get('expense_date'):
+    # Coerce user IDs once so the membership checks below compare ints to ints
+    try:
+        paid_by_id = int(data['paid_by_id'])
+        participant_ids = data.get('participant_ids', [])
+        if not isinstance(participant_ids, list):
+            raise TypeError
+        participant_ids = [int(user_id) for user_id in participant_ids]
+    except (ValueError, TypeError):
+        return jsonify({'error': 'Invalid paid by user ID or participant IDs'}), 400
+    data = {**data, 'paid_by_id': paid_by_id, 'participant_ids': participant_ids}
+
+    # Collect every user referenced by the request so membership is checked in one query
+    needed_ids = {current_user_id, paid_by_id}
+    if split_method == 'equal':
+        needed_ids.update(participant_ids)
+    else:
+        split_key = 'exact_amounts' if split_method == 'exact' else 'percentages'
+        for user_id_str in data.get(split_key, {}):
             try:
-                expense_date = datetime.fromisoformat(data['expense_date'].replace('Z', '+00:00'))
-            except ValueError:
-                return jsonify({'error': 'Invalid expense date format'}), 400
-
-        # Create expense
-        expense = Expense(
-            title=data['title'].strip(),
-            description=data.get('description', '').strip(),
-            amount=Decimal(str(data['amount'])),
-            category=data.get('category', 'general').strip(),
-            paid_by_id=data['paid_by_id'],
-            group_id=group_id,
-            created_by_id=current_user_id,
-            split_method=data.get('split_method', 'equal'),
-            expense_date=expense_date
+                needed_ids.add(int(user_id_str))
+            except (ValueError, TypeError):
+                pass  # Reported by the split validation below
+
+    active_member_ids = set(db.session.execute(
+        db.select(GroupMembership.user_id).where(
+            GroupMembership.group_id == group_id,
+            GroupMembership.is_active == True,
+            GroupMembership.user_id.in_(needed_ids)
         )
-
-        db.session.add(expense)
-        db.session.flush()  # Get expense ID
-
-        # Handle splitting based on method
-        split_method = data.get('split_method', 'equal')
-
-        if split_method == 'equal':
-            participant_ids = data.get('participant_ids', [])
-            if not participant_ids:
-                return jsonify({'error': 'Participant IDs required for equal split'}), 400
-
-            # Verify all participants are group members
-            for user_id in participant_ids:
-                participant_membership = GroupMembership.query.filter_by(
-                    group_id=group_id,
-                    user_id=user_id,
-                    is_active=True
-                ).first()
-                if not participant_membership:
-                    return jsonify({'error': f'User {user_id} is not a member of this group'}), 400
-
-            expense.split_equally(participant_ids)
-
-        elif split_method == 'exact':
-            exact_amounts = data.get('exact_amounts', {})
-            if not exact_amounts:
-                return jsonify({'error': 'Exact amounts required for exact split'}), 400
-
-            # Convert string keys to integers and validate
-            validated_amounts = {}
-            for user_id_str, amount in exact_amounts.items():
-                try:
-                    user_id = int(user_id_str)
-                    amount = float(amount)
-
-                    # Verify user is group member
-                    participant_membership = GroupMembership.query.filter_by(
-                        group_id=group_id,
-                        user_id=user_id,
-                        is_active=True
-                    ).first()
-                    if not participant_membership:
-                        return jsonify({'error': f'User {user_id} is not a member of this group'}), 400
-
-                    validated_amounts[user_id] = amount
-                except (ValueError, TypeError):
-                    return jsonify({'error': 'Invalid user ID or amount in exact_amounts'}), 400
-
-            expense.split_by_exact_amounts(validated_amounts)
-
-        elif split_method == 'percentage':
-            percentages = data.get('percentages', {})
-            if not percentages:
-                return jsonify({'error': 'Percentages required for percentage split'}), 400
-
-            # Convert and validate percentages
-            validated_percentages = {}
-            for user_id_str, percentage in percentages.items():
-                try:
-                    user_id = int(user_id_str)
-                    percentage = float(percentage)
-
-                    # Verify user is group member
-                    participant_membership = GroupMembership.query.filter_by(
-                        group_id=group_id,
-                        user_id=user_id,
-                        is_active=True
-                    ).first()
-                    if not participant_membership:
-                        return jsonify({'error': f'User {user_id} is not a member of this group'}), 400
-
-                    validated_percentages[user_id] = percentage
-                except (ValueError, TypeError):
-                    return jsonify({'error': 'Invalid user ID or percentage in percentages'}), 400
-
-            expense.split_by_percentages(validated_percentages)
-
-        db.session.commit()
-
-        return jsonify({
-            'message': 'Expense created successfully',
-            'expense': expense.to_dict()
-        }), 201
-
-    except ValueError as e:
-        db.session.rollback()
-        return jsonify({'error': str(e)}), 400
-    except Exception as e:
-        db.session.rollback()
-        return jsonify({'error': str(e)}), 500
+    ).scalars().all())
+
+    # Verify user is a member of this group
+    if current_user_id not in active_member_ids:
+        return jsonify({'error': 'Group not found or access denied'}), 404
+
+    # Verify paid_by user is also a group member
+    if paid_by_id not in active_member_ids:
+        return jsonify({'error': 'Paid by user is not a member of this group'}), 400
+
+    # Parse expense date
+    expense_date = datetime.utcnow()
+    if data.get('expense_date'):
+        try:
+            expense_date = parse_iso_datetime(data['expense_date'])
+        except ValueError:
+            return jsonify({'error': 'Invalid expense date format'}), 400
+
+    # Create expense
+    expense = Expense(
+        title=data['title'].strip(),
+        description=data.get('description', '').strip(),
+        amount=Decimal(str(data['amount'])),
+        category=data.get('category', 'general').strip(),
+        paid_by_id=paid_by_id,
+        group_id=group_id,
+        created_by_id=current_user_id,
+        split_method=split_method,
+        expense_date=expense_date
+    )
+
+    db.session.add(expense)
+    db.session.flush()  # Get expense ID
+
+    # Handle splitting based on method
+    error_response = SPLIT_HANDLERS[split_method](expense, data, active_member_ids)
+    if error_response:
+        return error_response
+
+    Group.adjust_total_expenses(group_id, to_cents(expense.amount))
+
+    db.session.commit()
+    cache.invalidate_groups([group_id])
+
+    return jsonify({
+        'message': 'Expense created successfully',
+        'expense': _expense_response(expense)
+    }), 201
 
 @expenses_bp.route('/group/<int:group_id>', methods=['GET'])
 @jwt_required()
 def get_group_expenses(group_id):
     """Get all expenses for a group"""
-    try:
-        current_user_id = get_jwt_identity()
-
-        # Verify user is a member of this group
-        membership = GroupMembership.query.filter_by(
-            group_id=group_id,
-            user_id=current_user_id,
-            is_active=True
-        ).first()
-
-        if not membership:
-            return jsonify({'error': 'Group not found or access denied'}), 404
-
-        # Get pagination parameters
-        page = request.args.get('page', 1, type=int)
-        per_page = request.args.get('per_page', 20, type=int)
-        category = request.args.get('category')
-
-        # Build query
-        query = Expense.query.filter_by(group_id=group_id, is_active=True)
-
-        if category:
-            query = query.filter_by(category=category)
-
-        query = query.order_by(Expense.expense_date.desc(), Expense.created_at.desc())
-
-        # Paginate
-        expenses_paginated = query.paginate(page=page, per_page=per_page, error_out=False)
-
-        return jsonify({
-            'expenses': [expense.to_dict() for expense in expenses_paginated.items],
-            'pagination': {
-                'page': page,
-                'per_page': per_page,
-                'total': expenses_paginated.total,
-                'pages': expenses_paginated.pages,
-                'has_next': expenses_paginated.has_next,
-                'has_prev': expenses_paginated.has_prev
-            }
-        }), 200
-
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+    # Verify user is a member of this group
+    membership = _current_membership(group_id)
+
+    if not membership:
+        return jsonify({'error': 'Group not found or access denied'}), 404
+
+    # Get pagination parameters
+    page = request.args.get('page', 1, type=int)
+    per_page = request.args.get('per_page', 20, type=int)
+    category = request.args.get('category')
+
+    # Build query
+    query = Expense.query.options(selectinload(Expense.paid_by)).filter_by(
+        group_id=group_id, is_active=True
+    )
+
+    if category:
+        query = query.filter_by(category=category)
+
+    query = query.order_by(Expense.expense_date.desc(), Expense.created_at.desc())
+
+    # Paginate
+    expenses_paginated = query.paginate(
+        page=page, per_page=per_page, max_per_page=MAX_PER_PAGE, error_out=False
+    )
+
+    return jsonify({
+        'expenses': Expense.to_dict_many(expenses_paginated.items),
+        'pagination': {
+            'page': page,
+            'per_page': expenses_paginated.per_page,
+            'total': expenses_paginated.total,
+            'pages': expenses_paginated.pages,
+            'has_next': expenses_paginated.has_next,
+            'has_prev': expenses_paginated.has_prev
+        }
+    }), 200
 
 @expenses_bp.route('/<int:expense_id>', methods=['GET'])
 @jwt_required()
 def get_expense(expense_id):
     """Get specific expense details"""
-    try:
-        current_user_id = get_jwt_identity()
-
-        expense = Expense.query.get(expense_id)
-        if not expense or not expense.is_active:
-            return jsonify({'error': 'Expense not found'}), 404
-
-        # Verify user is a member of the expense's group
-        membership = GroupMembership.query.filter_by(
-            group_id=expense.group_id,
-            user_id=current_user_id,
-            is_active=True
-        ).first()
-
-        if not membership:
-            return jsonify({'error': 'Access denied'}), 403
+    expense, membership = _get_expense_with_membership(expense_id)
+    if not expense:
+        return jsonify({'error': 'Expense not found'}), 404
 
-        return jsonify({
-            'expense': expense.to_dict()
-        }), 200
+    # Verify user is a member of the expense's group
+    if not membership:
+        return jsonify({'error': 'Access denied'}), 403
 
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+    return jsonify({
+        'expense': expense.to_dict()
+    }), 200
 
 @expenses_bp.route('/<int:expense_id>', methods=['PUT'])
 @jwt_required()
 def update_expense(expense_id):
     """Update an expense"""
-    try:
-        current_user_id = get_jwt_identity()
+    current_user_id = get_jwt_identity()
 
-        expense = Expense.query.get(expense_id)
-        if not expense or not expense.is_active:
-            return jsonify({'error': 'Expense not found'}), 404
+    expense, membership = _get_expense_with_membership(expense_id)
+    if not expense:
+        return jsonify({'error': 'Expense not found'}), 404
 
-        # Only expense creator or group admin can update
-        membership = GroupMembership.query.filter_by(
-            group_id=expense.group_id,
-            user_id=current_user_id,
-            is_active=True
-        ).first()
+    # Only expense creator or group admin can update
+    if not membership:
+        return jsonify({'error': 'Access denied'}), 403
 
-        if not membership:
-            return jsonify({'error': 'Access denied'}), 403
+    is_admin = membership.role == 'admin'
+    is_creator = expense.created_by_id == current_user_id
 
-        is_admin = membership.role == 'admin'
-        is_creator = expense.created_by_id == current_user_id
+    if not (is_admin or is_creator):
+        return jsonify({'error': 'Insufficient permissions'}), 403
 
-        if not (is_admin or is_creator):
-            return jsonify({'error': 'Insufficient permissions'}), 403
+    data = request.get_json()
 
-        data = request.get_json()
+    # Update basic fields
+    if 'title' in data:
+        expense.title = data['title'].strip()
 
-        # Update basic fields
-        if 'title' in data:
-            expense.title = data['title'].strip()
+    if 'description' in data:
+        expense.description = data['description'].strip()
 
-        if 'description' in data:
-            expense.description = data['description'].strip()
+    if 'category' in data:
+        expense.category = data['category'].strip()
 
-        if 'category' in data:
-            expense.category = data['category'].strip()
+    if 'expense_date' in data:
+        try:
+            expense.expense_date = parse_iso_datetime(data['expense_date'])
+        except ValueError:
+            return jsonify({'error': 'Invalid expense date format'}), 400
 
-        if 'expense_date' in data:
+    # Handle amount and split changes (more complex)
+    if 'amount' in data or 'split_method' in data:
+        # Check if any participants have already settled
+        if expense.has_settled_participants():
+            return jsonify({
+                'error': 'Cannot modify amount or split method - some participants have already settled'
+            }), 400
+
+        if 'amount' in data:
             try:
-                expense.expense_date = datetime.fromisoformat(data['expense_date'].replace('Z', '+00:00'))
-            except ValueError:
-                return jsonify({'error': 'Invalid expense date format'}), 400
-
-        # Handle amount and split changes (more complex)
-        if 'amount' in data or 'split_method' in data:
-            # Check if any participants have already settled
-            settled_participants = expense.participants.filter_by(is_settled=True).first()
-            if settled_participants:
-                return jsonify({
-                    'error': 'Cannot modify amount or split method - some participants have already settled'
-                }), 400
-
-            if 'amount' in data:
-                try:
-                    new_amount = float(data['amount'])
-                    if new_amount <= 0:
-                        return jsonify({'error': 'Amount must be positive'}), 400
-                    expense.amount = Decimal(str(new_amount))
-                except (ValueError, TypeError):
-                    return jsonify({'error': 'Invalid amount format'}), 400
-
-            # Re-split if split parameters provided
-            split_method = data.get('split_method', expense.split_method)
-
-            if split_method == 'equal' and 'participant_ids' in data:
-                expense.split_equally(data['participant_ids'])
-            elif split_method == 'exact' and 'exact_amounts' in data:
-                validated_amounts = {}
-                for user_id_str, amount in data['exact_amounts'].items():
-                    validated_amounts[int(user_id_str)] = float(amount)
-                expense.split_by_exact_amounts(validated_amounts)
-            elif split_method == 'percentage' and 'percentages' in data:
-                validated_percentages = {}
-                for user_id_str, percentage in data['percentages'].items():
-                    validated_percentages[int(user_id_str)] = float(percentage)
-                expense.split_by_percentages(validated_percentages)
-
-        db.session.commit()
+                new_amount = float(data['amount'])
+                if new_amount <= 0:
+                    return jsonify({'error': 'Amount must be positive'}), 400
+                old_cents = to_cents(expense.amount)
+                expense.amount = Decimal(str(new_amount))
+                Group.adjust_total_expenses(expense.group_id, to_cents(expense.amount) - old_cents)
+            except (ValueError, TypeError):
+                return jsonify({'error': 'Invalid amount format'}), 400
+
+        # Re-split if split parameters provided
+        split_method = data.get('split_method', expense.split_method)
+
+        if split_method == 'equal' and 'participant_ids' in data:
+            expense.split_equally(data['participant_ids'])
+        elif split_method == 'exact' and 'exact_amounts' in data:
+            validated_amounts = {}
+            for user_id_str, amount in data['exact_amounts'].items():
+                validated_amounts[int(user_id_str)] = float(amount)
+            expense.split_by_exact_amounts(validated_amounts)
+        elif split_method == 'percentage' and 'percentages' in data:
+            validated_percentages = {}
+            for user_id_str, percentage in data['percentages'].items():
+                validated_percentages[int(user_id_str)] = float(percentage)
+            expense.split_by_percentages(validated_percentages)
 
-        return jsonify({
-            'message': 'Expense updated successfully',
-            'expense': expense.to_dict()
-        }), 200
+    db.session.commit()
+    cache.invalidate_groups([expense.group_id])
 
-    except ValueError as e:
-        db.session.rollback()
-        return jsonify({'error': str(e)}), 400
-    except Exception as e:
-        db.session.rollback()
-        return jsonify({'error': str(e)}), 500
+    return jsonify({
+        'message': 'Expense updated successfully',
+        'expense': _expense_response(expense)
+    }), 200
 
 @expenses_bp.route('/<int:expense_id>', methods=['DELETE'])
 @jwt_required()
 def delete_expense(expense_id):
     """Delete an expense"""
-    try:
-        current_user_id = get_jwt_identity()
+    current_user_id = get_jwt_identity()
 
-        expense = Expense.query.get(expense_id)
-        if not expense or not expense.is_active:
-            return jsonify({'error': 'Expense not found'}), 404
+    expense, membership = _get_expense_with_membership(expense_id)
+    if not expense:
+        return jsonify({'error': 'Expense not found'}), 404
 
-        # Only expense creator or group admin can delete
-        membership = GroupMembership.query.filter_by(
-            group_id=expense.group_id,
-            user_id=current_user_id,
-            is_active=True
-        ).first()
+    # Only expense creator or group admin can delete
+    if not membership:
+        return jsonify({'error': 'Access denied'}), 403
 
-        if not membership:
-            return jsonify({'error': 'Access denied'}), 403
+    is_admin = membership.role == 'admin'
+    is_creator = expense.created_by_id == current_user_id
 
-        is_admin = membership.role == 'admin'
-        is_creator = expense.created_by_id == current_user_id
-
-        if not (is_admin or is_creator):
-            return jsonify({'error': 'Insufficient permissions'}), 403
-
-        # Check if any participants have settled
-        settled_participants = expense.participants.filter_by(is_settled=True).first()
-        if settled_participants:
-            return jsonify({
-                'error': 'Cannot delete expense - some participants have already settled'
-            }), 400
-
-        # Soft delete
-        expense.is_active = False
-        db.session.commit()
+    if not (is_admin or is_creator):
+        return jsonify({'error': 'Insufficient permissions'}), 403
 
+    # Check if any participants have settled
+    if expense.has_settled_participants():
         return jsonify({
-            'message': 'Expense deleted successfully'
-        }), 200
+            'error': 'Cannot delete expense - some participants have already settled'
+        }), 400
+
+    # Soft delete
+    expense.is_active = False
+    Group.adjust_total_expenses(expense.group_id, -to_cents(expense.amount))
+    db.session.commit()
+    cache.invalidate_groups([expense.group_id])
 
-    except Exception as e:
-        db.session.rollback()
-        return jsonify({'error': str(e)}), 500
+    return jsonify({
+        'message': 'Expense deleted successfully'
+    }), 200
 
 @expenses_bp.route('/<int:expense_id>/settle', methods=['POST'])
 @jwt_required()
 def settle_expense_participation(expense_id):
     """Mark user's participation in an expense as settled"""
-    try:
-        current_user_id = get_jwt_identity()
-
-        expense = Expense.query.get(expense_id)
-        if not expense or not expense.is_active:
-            return jsonify({'error': 'Expense not found'}), 404
+    current_user_id = get_jwt_identity()
+
+    expense = Expense.query.get(expense_id)
+    if not expense or not expense.is_active:
+        return jsonify({'error': 'Expense not found'}), 404
+
+    # Settle the user's participation in one conditional UPDATE, so concurrent
+    # requests cannot both settle it (and both record a settlement)
+    amount_owed = db.session.execute(
+        db.update(ExpenseParticipant)
+        .where(
+            ExpenseParticipant.expense_id == expense_id,
+            ExpenseParticipant.user_id == current_user_id,
+            ExpenseParticipant.is_settled == False
+        )
+        .values(is_settled=True, settled_at=datetime.utcnow())
+        .returning(ExpenseParticipant.amount_owed)
+    ).scalar()
 
-        # Find user's participation in this expense
+    if amount_owed is None:
         participation = ExpenseParticipant.query.filter_by(
             expense_id=expense_id,
             user_id=current_user_id
@@ -422,108 +458,106 @@ def settle_expense_participation(expense_id):
         if not participation:
             return jsonify({'error': 'You are not a participant in this expense'}), 404
 
-        if participation.is_settled:
-            return jsonify({'error': 'Your participation is already marked as settled'}), 400
-
-        # Create settlement record if specified
-        data = request.get_json() or {}
-        if data.get('create_settlement', False):
-            Settlement.create_settlement(
-                from_user_id=current_user_id,
-                to_user_id=expense.paid_by_id,
-                amount=participation.amount_owed,
-                group_id=expense.group_id,
-                reference_expense_id=expense_id,
-                description=f"Settlement for: {expense.title}",
-                payment_method=data.get('payment_method', 'cash'),
-                settlement_date=datetime.utcnow()
-            )
-
-        # Mark as settled
-        participation.mark_as_settled()
+        return jsonify({'error': 'Your participation is already marked as settled'}), 400
 
-        return jsonify({
-            'message': 'Participation marked as settled',
-            'expense': expense.to_dict()
-        }), 200
+    # Create settlement record if specified
+    data = request.get_json() or {}
+    if data.get('create_settlement', False):
+        Settlement.create_settlement(
+            from_user_id=current_user_id,
+            to_user_id=expense.paid_by_id,
+            amount=amount_owed,
+            group_id=expense.group_id,
+            reference_expense_id=expense_id,
+            description=f"Settlement for: {expense.title}",
+            payment_method=data.get('payment_method', 'cash'),
+            settlement_date=datetime.utcnow()
+        )
+
+    db.session.commit()
 
-    except Exception as e:
-        db.session.rollback()
-        return jsonify({'error': str(e)}), 500
+    return jsonify({
+        'message': 'Participation marked as settled',
+        'expense': _expense_response(expense)
+    }), 200
 
 @expenses_bp.route('/statistics/group/<int:group_id>', methods=['GET'])
 @jwt_required()
 def get_group_expense_statistics(group_id):
     """Get expense statistics for a group"""
-    try:
-        current_user_id = get_jwt_identity()
-
-        # Verify user is a member of this group
-        membership = GroupMembership.query.filter_by(
-            group_id=group_id,
-            user_id=current_user_id,
-            is_active=True
-        ).first()
-
-        if not membership:
-            return jsonify({'error': 'Group not found or access denied'}), 404
-
-        # Get date range (default to last 30 days)
-        end_date = datetime.utcnow()
-        start_date = end_date - timedelta(days=30)
-
-        if request.args.get('start_date'):
-            start_date = datetime.fromisoformat(request.args.get('start_date'))
-        if request.args.get('end_date'):
-            end_date = datetime.fromisoformat(request.args.get('end_date'))
-
-        # Get expenses in date range
-        expenses = Expense.query.filter(
-            Expense.group_id == group_id,
-            Expense.is_active == True,
-            Expense.expense_date >= start_date,
-            Expense.expense_date <= end_date
-        ).all()
-
-        # Calculate statistics
-        total_amount = sum(float(expense.amount) for expense in expenses)
-        expense_count = len(expenses)
-
-        # Category breakdown
-        category_stats = {}
-        for expense in expenses:
-            category = expense.category
-            if category not in category_stats:
-                category_stats[category] = {'count': 0, 'amount': 0}
-            category_stats[category]['count'] += 1
-            category_stats[category]['amount'] += float(expense.amount)
-
-        # Top spenders
-        spender_stats = {}
-        for expense in expenses:
-            user_id = expense.paid_by_id
-            if user_id not in spender_stats:
-                spender_stats[user_id] = {
-                    'user': expense.paid_by.to_dict(),
-                    'count': 0,
-                    'amount': 0
-                }
-            spender_stats[user_id]['count'] += 1
-            spender_stats[user_id]['amount'] += float(expense.amount)
-
-        return jsonify({
-            'period': {
-                'start_date': start_date.isoformat(),
-                'end_date': end_date.isoformat()
-            },
-            'summary': {
-                'total_amount': total_amount,
-                'expense_count': expense_count,
-                'average_expense': total_amount / expense_count if expense_count > 0 else 0
-            },
-            'category_breakdown': category_stats,
-            'top_spenders': sorted(spender_stats.values(), key=lambda x: x['amount'], reverse=True)[:5]
-        }), 200
-
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+    # Verify user is a member of this group
+    membership = _current_membership(group_id)
+
+    if not membership:
+        return jsonify({'error': 'Group not found or access denied'}), 404
+
+    # Get date range (default to last 30 days)
+    end_date = datetime.utcnow()
+    start_date = end_date - timedelta(days=30)
+
+    if request.args.get('start_date'):
+        start_date = datetime.fromisoformat(request.args.get('start_date'))
+    if request.args.get('end_date'):
+        end_date = datetime.fromisoformat(request.args.get('end_date'))
+
+    # Filter shared by all aggregates below
+    in_range = (
+        Expense.group_id == group_id,
+        Expense.is_active == True,
+        Expense.expense_date >= start_date,
+        Expense.expense_date <= end_date
+    )
+
+    # Calculate statistics in the database
+    total, expense_count = db.session.execute(
+        db.select(db.func.sum(Expense.amount), db.func.count(Expense.id)).where(*in_range)
+    ).one()
+    total_amount = float(total or 0)
+
+    # Category breakdown
+    category_rows = db.session.execute(
+        db.select(Expense.category, db.func.count(Expense.id), db.func.sum(Expense.amount))
+        .where(*in_range)
+        .group_by(Expense.category)
+    ).all()
+    category_stats = {
+        category: {'count': count, 'amount': float(amount)}
+        for category, count, amount in category_rows
+    }
+
+    # Top spenders
+    spender_totals = (
+        db.select(
+            Expense.paid_by_id,
+            db.func.count(Expense.id).label('count'),
+            db.func.sum(Expense.amount).label('amount')
+        )
+        .where(*in_range)
+        .group_by(Expense.paid_by_id)
+        .order_by(db.func.sum(Expense.amount).desc())
+        .limit(5)
+        .subquery()
+    )
+    spender_rows = db.session.execute(
+        db.select(User, spender_totals.c.count, spender_totals.c.amount)
+        .join(spender_totals, User.id == spender_totals.c.paid_by_id)
+        .order_by(spender_totals.c.amount.desc())
+    ).all()
+    top_spenders = [
+        {'user': user.to_dict(), 'count': count, 'amount': float(amount)}
+        for user, count, amount in spender_rows
+    ]
+
+    return jsonify({
+        'period': {
+            'start_date': start_date,
+            'end_date': end_date
+        },
+        'summary': {
+            'total_amount': total_amount,
+            'expense_count': expense_count,
+            'average_expense': total_amount / expense_count if expense_count > 0 else 0
+        },
+        'category_breakdown': category_stats,
+        'top_spenders': top_spenders
+    }), 200
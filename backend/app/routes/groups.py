@@ -1,382 +1,515 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from app.extensions import db
+from app.extensions import db, cache
 from app.models.user import User
 from app.models.group import Group, GroupMembership
-from app.models.expense import Expense
+from app.models.expense import Expense, ExpenseParticipant
+from app.models.settlement import Settlement
+from app.services.bill_calculator import BillCalculator
+from app.services.cache import group_key, group_balances_key, user_groups_key
+from app.utils import orjson_dumps
 from sqlalchemy.orm import joinedload
+from decimal import Decimal
 
 groups_bp = Blueprint('groups', __name__)
 
+VALID_ROLES = ('admin', 'member')
+
+# Upper bound on groups serialized per page when the groups list is paginated
+MAX_GROUPS_PER_PAGE = 100
+
+def validate_group_data(data, partial=False):
+    """
+    Validate and normalize group fields in a single pass
+    Returns (fields, error); with partial=True only the fields present are checked
+    """
+    if not isinstance(data, dict):
+        return None, 'Invalid request body'
+
+    fields = {}
+
+    if not partial or 'name' in data:
+        name = data.get('name')
+        name = name.strip() if isinstance(name, str) else ''
+        if not name:
+            return None, 'Group name cannot be empty' if partial else 'Group name is required'
+        fields['name'] = name
+
+    if not partial or 'description' in data:
+        description = data.get('description') or ''
+        if not isinstance(description, str):
+            return None, 'Group description must be a string'
+        fields['description'] = description.strip()
+
+    if not partial:
+        member_emails = data.get('member_emails') or []
+        if not isinstance(member_emails, list):
+            return None, 'member_emails must be a list'
+        # Normalize and dedupe up front so the member lookup sees each address once
+        fields['member_emails'] = {
+            email.lower().strip() for email in member_emails
+            if isinstance(email, str) and email.strip()
+        }
+
+    return fields, None
+
+def validate_member_data(data):
+    """
+    Validate and normalize an add-member request
+    Returns (email, role, error)
+    """
+    if not isinstance(data, dict):
+        return None, None, 'Invalid request body'
+
+    email = data.get('email')
+    email = email.lower().strip() if isinstance(email, str) else ''
+    if not email:
+        return None, None, 'Email is required'
+
+    role = data.get('role', 'member')
+    if role not in VALID_ROLES:
+        return None, None, 'Invalid role. Must be admin or member'
+
+    return email, role, None
+
 @groups_bp.route('', methods=['POST'])
 @jwt_required()
 def create_group():
     """Create a new group"""
-    try:
-        current_user_id = get_jwt_identity()
-        data = request.get_json()
-
-        # Validate required fields
-        if not data.get('name'):
-            return jsonify({'error': 'Group name is required'}), 400
-
-        name = data['name'].strip()
-        description = data.get('description', '').strip()
-
-        # Create group
-        group = Group(
-            name=name,
-            description=description,
-            created_by_id=current_user_id
+    current_user_id = get_jwt_identity()
+    fields, error = validate_group_data(request.get_json(silent=True))
+    if error:
+        return jsonify({'error': error}), 400
+
+    # Create group
+    group = Group(
+        name=fields['name'],
+        description=fields['description'],
+        created_by_id=current_user_id
+    )
+
+    db.session.add(group)
+    db.session.flush()  # Get the group ID
+
+    # Add creator as admin member
+    membership_rows = [{'group_id': group.id, 'user_id': current_user_id, 'role': 'admin'}]
+
+    # Add initial members if provided, looking all of them up in one query
+    # (the creator is excluded by ID, so listing their own email is harmless)
+    emails = fields['member_emails']
+    if emails:
+        member_ids = db.session.execute(
+            db.select(User.id).where(User.email.in_(emails), User.id != current_user_id)
+        ).scalars().all()
+
+        membership_rows.extend(
+            {'group_id': group.id, 'user_id': user_id, 'role': 'member'}
+            for user_id in member_ids
         )
 
-        db.session.add(group)
-        db.session.flush()  # Get the group ID
+    # Insert all memberships in a single executemany
+    db.session.execute(db.insert(GroupMembership), membership_rows)
 
-        # Add creator as admin member
-        membership = GroupMembership(
-            group_id=group.id,
-            user_id=current_user_id,
-            role='admin'
-        )
-        db.session.add(membership)
-
-        # Add initial members if provided
-        initial_members = data.get('member_emails', [])
-        if initial_members:
-            for email in initial_members:
-                email = email.lower().strip()
-                user = User.query.filter_by(email=email).first()
-                if user and user.id != current_user_id:
-                    membership = GroupMembership(
-                        group_id=group.id,
-                        user_id=user.id,
-                        role='member'
-                    )
-                    db.session.add(membership)
-
-        db.session.commit()
+    db.session.commit()
+    cache.invalidate_groups([group.id])
 
-        return jsonify({
-            'message': 'Group created successfully',
-            'group': group.to_dict(include_members=True)
-        }), 201
-
-    except Exception as e:
-        db.session.rollback()
-        return jsonify({'error': str(e)}), 500
+    return jsonify({
+        'message': 'Group created successfully',
+        'group': group.to_dict(include_members=True)
+    }), 201
 
 @groups_bp.route('', methods=['GET'])
 @jwt_required()
 def get_user_groups():
     """Get all groups for the current user"""
-    try:
-        current_user_id = get_jwt_identity()
-
-        # Get all groups where user is a member
-        groups = db.session.query(Group).join(GroupMembership).filter(
-            GroupMembership.user_id == current_user_id,
-            GroupMembership.is_active == True,
-            Group.is_active == True
-        ).all()
-
+    current_user_id = get_jwt_identity()
+
+    # Optional keyset pagination: ?limit=N&cursor=<last group id of the previous page>
+    limit = request.args.get('limit', type=int)
+    cursor = request.args.get('cursor', type=int)
+
+    # Get all groups where user is a member
+    query = db.session.query(Group).join(GroupMembership).filter(
+        GroupMembership.user_id == current_user_id,
+        GroupMembership.is_active == True,
+        Group.is_active == True
+    ).order_by(Group.id)
+
+    if cursor:
+        query = query.filter(Group.id > cursor)
+
+    if not limit and not cursor:
+        # The full list is cached as serialized bytes, so a hit skips DB and JSON work
+        body = cache.get_raw(user_groups_key(current_user_id))
+        if body is None:
+            body = orjson_dumps({
+                'groups': Group.to_dict_many(query.all(), include_members=True)
+            })
+            cache.set_raw(user_groups_key(current_user_id), body)
+
+        return current_app.response_class(body, mimetype='application/json'), 200
+
+    if not limit:
         return jsonify({
-            'groups': [group.to_dict(include_members=True) for group in groups]
+            'groups': Group.to_dict_many(query.all(), include_members=True)
         }), 200
 
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+    limit = min(max(limit, 1), MAX_GROUPS_PER_PAGE)
+    groups = query.limit(limit + 1).all()
+    has_next = len(groups) > limit
+    groups = groups[:limit]
+
+    return jsonify({
+        'groups': Group.to_dict_many(groups, include_members=True),
+        'next_cursor': groups[-1].id if has_next else None
+    }), 200
 
 @groups_bp.route('/<int:group_id>', methods=['GET'])
 @jwt_required()
 def get_group(group_id):
     """Get specific group details"""
-    try:
-        current_user_id = get_jwt_identity()
+    current_user_id = get_jwt_identity()
 
-        # Verify user is a member of this group
-        membership = GroupMembership.query.filter_by(
-            group_id=group_id,
-            user_id=current_user_id,
-            is_active=True
-        ).first()
+    # Load the group and verify the user is a member of it in one query
+    group = db.session.execute(
+        db.select(Group)
+        .join(GroupMembership, db.and_(
+            GroupMembership.group_id == Group.id,
+            GroupMembership.user_id == current_user_id,
+            GroupMembership.is_active == True
+        ))
+        .where(Group.id == group_id, Group.is_active == True)
+    ).scalar()
 
-        if not membership:
-            return jsonify({'error': 'Group not found or access denied'}), 404
+    if not group:
+        return jsonify({'error': 'Group not found or access denied'}), 404
 
-        group = Group.query.get(group_id)
-        if not group or not group.is_active:
-            return jsonify({'error': 'Group not found'}), 404
+    group_data = cache.get(group_key(group_id))
+    if group_data is None:
+        group_data = group.to_dict(include_members=True, include_balances=True)
+        cache.set(group_key(group_id), group_data)
 
-        return jsonify({
-            'group': group.to_dict(include_members=True, include_balances=True)
-        }), 200
-
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+    return jsonify({
+        'group': group_data
+    }), 200
 
 @groups_bp.route('/<int:group_id>', methods=['PUT'])
 @jwt_required()
 def update_group(group_id):
     """Update group details"""
-    try:
-        current_user_id = get_jwt_identity()
+    current_user_id = get_jwt_identity()
 
-        # Verify user is an admin of this group
-        membership = GroupMembership.query.filter_by(
-            group_id=group_id,
-            user_id=current_user_id,
-            role='admin',
-            is_active=True
-        ).first()
+    # Verify user is an admin of this group
+    membership = GroupMembership.query.filter_by(
+        group_id=group_id,
+        user_id=current_user_id,
+        role='admin',
+        is_active=True
+    ).first()
 
-        if not membership:
-            return jsonify({'error': 'Group not found or insufficient permissions'}), 403
+    if not membership:
+        return jsonify({'error': 'Group not found or insufficient permissions'}), 403
 
-        group = Group.query.get(group_id)
-        if not group:
-            return jsonify({'error': 'Group not found'}), 404
+    group = Group.query.get(group_id)
+    if not group:
+        return jsonify({'error': 'Group not found'}), 404
 
-        data = request.get_json()
+    fields, error = validate_group_data(request.get_json(silent=True), partial=True)
+    if error:
+        return jsonify({'error': error}), 400
 
-        # Update allowed fields
-        if 'name' in data:
-            name = data['name'].strip()
-            if not name:
-                return jsonify({'error': 'Group name cannot be empty'}), 400
-            group.name = name
+    # Update allowed fields
+    for field, value in fields.items():
+        setattr(group, field, value)
 
-        if 'description' in data:
-            group.description = data['description'].strip()
+    db.session.commit()
+    cache.invalidate_groups([group_id])
 
-        db.session.commit()
-
-        return jsonify({
-            'message': 'Group updated successfully',
-            'group': group.to_dict(include_members=True)
-        }), 200
-
-    except Exception as e:
-        db.session.rollback()
-        return jsonify({'error': str(e)}), 500
+    return jsonify({
+        'message': 'Group updated successfully',
+        'group': group.to_dict(include_members=True)
+    }), 200
 
 @groups_bp.route('/<int:group_id>/members', methods=['POST'])
 @jwt_required()
 def add_member(group_id):
     """Add member to group"""
-    try:
-        current_user_id = get_jwt_identity()
-
-        # Verify user is an admin of this group
-        membership = GroupMembership.query.filter_by(
-            group_id=group_id,
-            user_id=current_user_id,
-            role='admin',
-            is_active=True
-        ).first()
-
-        if not membership:
-            return jsonify({'error': 'Group not found or insufficient permissions'}), 403
-
-        data = request.get_json()
-        email = data.get('email', '').lower().strip()
-
-        if not email:
-            return jsonify({'error': 'Email is required'}), 400
-
-        # Find user to add
-        user_to_add = User.query.filter_by(email=email).first()
-        if not user_to_add:
-            return jsonify({'error': 'User not found with this email'}), 404
-
-        # Check if user is already a member
-        existing_membership = GroupMembership.query.filter_by(
-            group_id=group_id,
-            user_id=user_to_add.id
-        ).first()
-
-        if existing_membership:
-            if existing_membership.is_active:
-                return jsonify({'error': 'User is already a member of this group'}), 409
-            else:
-                # Reactivate membership
-                existing_membership.is_active = True
-                existing_membership.role = data.get('role', 'member')
+    current_user_id = get_jwt_identity()
+
+    # Verify user is an admin of this group
+    membership = GroupMembership.query.filter_by(
+        group_id=group_id,
+        user_id=current_user_id,
+        role='admin',
+        is_active=True
+    ).first()
+
+    if not membership:
+        return jsonify({'error': 'Group not found or insufficient permissions'}), 403
+
+    email, role, error = validate_member_data(request.get_json(silent=True))
+    if error:
+        return jsonify({'error': error}), 400
+
+    # Find user to add
+    user_to_add = User.query.filter_by(email=email).first()
+    if not user_to_add:
+        return jsonify({'error': 'User not found with this email'}), 404
+
+    # Check if user is already a member
+    existing_membership = GroupMembership.query.filter_by(
+        group_id=group_id,
+        user_id=user_to_add.id
+    ).first()
+
+    if existing_membership:
+        if existing_membership.is_active:
+            return jsonify({'error': 'User is already a member of this group'}), 409
         else:
-            # Create new membership
-            new_membership = GroupMembership(
-                group_id=group_id,
-                user_id=user_to_add.id,
-                role=data.get('role', 'member')
-            )
-            db.session.add(new_membership)
-
-        db.session.commit()
+            # Reactivate membership
+            existing_membership.is_active = True
+            existing_membership.role = role
+    else:
+        # Create new membership
+        new_membership = GroupMembership(
+            group_id=group_id,
+            user_id=user_to_add.id,
+            role=role
+        )
+        db.session.add(new_membership)
 
-        group = Group.query.get(group_id)
+    db.session.commit()
+    cache.invalidate_groups([group_id])
 
-        return jsonify({
-            'message': 'Member added successfully',
-            'group': group.to_dict(include_members=True)
-        }), 200
+    group = Group.query.get(group_id)
 
-    except Exception as e:
-        db.session.rollback()
-        return jsonify({'error': str(e)}), 500
+    return jsonify({
+        'message': 'Member added successfully',
+        'group': group.to_dict(include_members=True)
+    }), 200
 
 @groups_bp.route('/<int:group_id>/members/<int:user_id>', methods=['DELETE'])
 @jwt_required()
 def remove_member(group_id, user_id):
     """Remove member from group"""
-    try:
-        current_user_id = get_jwt_identity()
-
-        # Verify user is an admin of this group or removing themselves
-        admin_membership = GroupMembership.query.filter_by(
-            group_id=group_id,
-            user_id=current_user_id,
-            role='admin',
-            is_active=True
-        ).first()
+    current_user_id = get_jwt_identity()
+
+    # Verify user is an admin of this group or removing themselves
+    admin_membership = GroupMembership.query.filter_by(
+        group_id=group_id,
+        user_id=current_user_id,
+        role='admin',
+        is_active=True
+    ).first()
+
+    if not admin_membership and current_user_id != user_id:
+        return jsonify({'error': 'Insufficient permissions'}), 403
+
+    # Find the membership to remove
+    membership_to_remove = GroupMembership.query.filter_by(
+        group_id=group_id,
+        user_id=user_id,
+        is_active=True
+    ).first()
+
+    if not membership_to_remove:
+        return jsonify({'error': 'Member not found in this group'}), 404
+
+    # Count admins and probe for unsettled expenses in a single round-trip
+    admin_count, has_unsettled = db.session.execute(
+        db.select(
+            db.select(db.func.count(GroupMembership.id)).where(
+                GroupMembership.group_id == group_id,
+                GroupMembership.role == 'admin',
+                GroupMembership.is_active == True
+            ).scalar_subquery(),
+            db.select(ExpenseParticipant.id).join(
+                Expense, Expense.id == ExpenseParticipant.expense_id
+            ).where(
+                Expense.group_id == group_id,
+                Expense.is_active == True,
+                ExpenseParticipant.user_id == user_id,
+                ExpenseParticipant.is_settled == False
+            ).exists()
+        )
+    ).one()
 
-        if not admin_membership and current_user_id != user_id:
-            return jsonify({'error': 'Insufficient permissions'}), 403
+    # Prevent removing the last admin
+    if membership_to_remove.role == 'admin' and admin_count <= 1:
+        return jsonify({'error': 'Cannot remove the last admin from the group'}), 400
 
-        # Find the membership to remove
-        membership_to_remove = GroupMembership.query.filter_by(
-            group_id=group_id,
-            user_id=user_id,
-            is_active=True
-        ).first()
-
-        if not membership_to_remove:
-            return jsonify({'error': 'Member not found in this group'}), 404
-
-        # Prevent removing the last admin
-        if membership_to_remove.role == 'admin':
-            admin_count = GroupMembership.query.filter_by(
-                group_id=group_id,
-                role='admin',
-                is_active=True
-            ).count()
-
-            if admin_count <= 1:
-                return jsonify({'error': 'Cannot remove the last admin from the group'}), 400
-
-        # Check if user has unsettled expenses
-        unsettled_participations = db.session.query(Expense).join(
-            'participants'
-        ).filter(
-            Expense.group_id == group_id,
-            Expense.is_active == True,
-            ExpenseParticipant.user_id == user_id,
-            ExpenseParticipant.is_settled == False
-        ).first()
-
-        if unsettled_participations:
-            return jsonify({
-                'error': 'Cannot remove member with unsettled expenses. Please settle all expenses first.'
-            }), 400
-
-        # Deactivate membership
-        membership_to_remove.is_active = False
-        db.session.commit()
+    # Check if user has unsettled expenses
+    if has_unsettled:
+        return jsonify({
+            'error': 'Cannot remove member with unsettled expenses. Please settle all expenses first.'
+        }), 400
 
-        group = Group.query.get(group_id)
+    # Deactivate membership
+    membership_to_remove.is_active = False
+    db.session.commit()
+    cache.invalidate_groups([group_id], user_ids=[user_id])
 
-        return jsonify({
-            'message': 'Member removed successfully',
-            'group': group.to_dict(include_members=True)
-        }), 200
+    group = Group.query.get(group_id)
 
-    except Exception as e:
-        db.session.rollback()
-        return jsonify({'error': str(e)}), 500
+    return jsonify({
+        'message': 'Member removed successfully',
+        'group': group.to_dict(include_members=True)
+    }), 200
 
 @groups_bp.route('/<int:group_id>/members/<int:user_id>/role', methods=['PUT'])
 @jwt_required()
 def update_member_role(group_id, user_id):
     """Update member role in group"""
-    try:
-        current_user_id = get_jwt_identity()
-
-        # Verify user is an admin of this group
-        admin_membership = GroupMembership.query.filter_by(
+    current_user_id = get_jwt_identity()
+
+    # Verify user is an admin of this group
+    admin_membership = GroupMembership.query.filter_by(
+        group_id=group_id,
+        user_id=current_user_id,
+        role='admin',
+        is_active=True
+    ).first()
+
+    if not admin_membership:
+        return jsonify({'error': 'Insufficient permissions'}), 403
+
+    data = request.get_json(silent=True) or {}
+    new_role = data.get('role')
+
+    if new_role not in VALID_ROLES:
+        return jsonify({'error': 'Invalid role. Must be admin or member'}), 400
+
+    # Find the membership to update
+    membership = GroupMembership.query.filter_by(
+        group_id=group_id,
+        user_id=user_id,
+        is_active=True
+    ).first()
+
+    if not membership:
+        return jsonify({'error': 'Member not found in this group'}), 404
+
+    # Prevent demoting the last admin
+    if membership.role == 'admin' and new_role != 'admin':
+        admin_count = GroupMembership.query.filter_by(
             group_id=group_id,
-            user_id=current_user_id,
             role='admin',
             is_active=True
-        ).first()
+        ).count()
 
-        if not admin_membership:
-            return jsonify({'error': 'Insufficient permissions'}), 403
+        if admin_count <= 1:
+            return jsonify({'error': 'Cannot demote the last admin'}), 400
 
-        data = request.get_json()
-        new_role = data.get('role')
+    membership.role = new_role
+    db.session.commit()
+    cache.invalidate_groups([group_id])
 
-        if new_role not in ['admin', 'member']:
-            return jsonify({'error': 'Invalid role. Must be admin or member'}), 400
+    group = Group.query.get(group_id)
 
-        # Find the membership to update
-        membership = GroupMembership.query.filter_by(
-            group_id=group_id,
-            user_id=user_id,
-            is_active=True
-        ).first()
-
-        if not membership:
-            return jsonify({'error': 'Member not found in this group'}), 404
-
-        # Prevent demoting the last admin
-        if membership.role == 'admin' and new_role != 'admin':
-            admin_count = GroupMembership.query.filter_by(
-                group_id=group_id,
-                role='admin',
-                is_active=True
-            ).count()
-
-            if admin_count <= 1:
-                return jsonify({'error': 'Cannot demote the last admin'}), 400
-
-        membership.role = new_role
-        db.session.commit()
-
-        group = Group.query.get(group_id)
-
-        return jsonify({
-            'message': 'Member role updated successfully',
-            'group': group.to_dict(include_members=True)
-        }), 200
-
-    except Exception as e:
-        db.session.rollback()
-        return jsonify({'error': str(e)}), 500
+    return jsonify({
+        'message': 'Member role updated successfully',
+        'group': group.to_dict(include_members=True)
+    }), 200
 
 @groups_bp.route('/<int:group_id>/balance', methods=['GET'])
 @jwt_required()
 def get_group_balance(group_id):
     """Get balance summary for group"""
-    try:
-        current_user_id = get_jwt_identity()
+    current_user_id = get_jwt_identity()
 
-        # Verify user is a member of this group
-        membership = GroupMembership.query.filter_by(
-            group_id=group_id,
-            user_id=current_user_id,
-            is_active=True
-        ).first()
+    # Verify user is a member of this group
+    membership = GroupMembership.query.filter_by(
+        group_id=group_id,
+        user_id=current_user_id,
+        is_active=True
+    ).first()
 
-        if not membership:
-            return jsonify({'error': 'Group not found or access denied'}), 404
+    if not membership:
+        return jsonify({'error': 'Group not found or access denied'}), 404
 
+    member_balances = cache.get(group_balances_key(group_id))
+    if member_balances is None:
         group = Group.query.get(group_id)
         if not group:
             return jsonify({'error': 'Group not found'}), 404
 
-        return jsonify({
-            'group_id': group_id,
-            'member_balances': group.get_member_balances()
-        }), 200
+        member_balances = group.get_member_balances()
+        cache.set(group_balances_key(group_id), member_balances)
+
+    return jsonify({
+        'group_id': group_id,
+        'member_balances': member_balances
+    }), 200
 
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+@groups_bp.route('/<int:group_id>/settle-up', methods=['POST'])
+@jwt_required()
+def settle_up_group(group_id):
+    """Record the fewest pending settlements that clear every member's balance"""
+    current_user_id = get_jwt_identity()
+
+    # Verify user is a member of this group
+    membership = GroupMembership.query.filter_by(
+        group_id=group_id,
+        user_id=current_user_id,
+        is_active=True
+    ).first()
+
+    if not membership:
+        return jsonify({'error': 'Group not found or access denied'}), 404
+
+    group = Group.query.get(group_id)
+    if not group:
+        return jsonify({'error': 'Group not found'}), 404
+
+    data = request.get_json(silent=True) or {}
+
+    # Net expense balances, less what members have already paid each other in
+    # this group (undisputed settlements), so repeated settle-ups don't double up
+    balances = {
+        user_id: Decimal(balance['net_balance'])
+        for user_id, balance in group.get_member_balances().items()
+    }
+
+    settled_rows = db.session.execute(
+        db.select(Settlement.from_user_id, Settlement.to_user_id, db.func.sum(Settlement.amount))
+        .where(Settlement.group_id == group_id, Settlement.status != 'disputed')
+        .group_by(Settlement.from_user_id, Settlement.to_user_id)
+    ).all()
+
+    for from_user_id, to_user_id, amount in settled_rows:
+        if from_user_id in balances:
+            balances[from_user_id] += amount
+        if to_user_id in balances:
+            balances[to_user_id] -= amount
+
+    # Greedy netting: at most one transfer fewer than there are members with a balance
+    transfers = BillCalculator.optimize_settlements(balances)
+
+    settlement_ids = Settlement.create_settlements_bulk([
+        {
+            'from_user_id': transfer['from'],
+            'to_user_id': transfer['to'],
+            'amount': transfer['amount'],
+            'group_id': group_id,
+            'description': f"Settle-up in {group.name}",
+            'payment_method': data.get('payment_method', 'cash')
+        }
+        for transfer in transfers
+    ])
+
+    db.session.commit()
+    if settlement_ids:
+        cache.invalidate_groups([group_id])
+
+    return jsonify({
+        'message': f'Recorded {len(settlement_ids)} settlement(s)',
+        'settlements': [
+            {
+                'id': settlement_id,
+                'from_user_id': transfer['from'],
+                'to_user_id': transfer['to'],
+                'amount': float(transfer['amount'])
+            }
+            for settlement_id, transfer in zip(settlement_ids, transfers)
+        ]
+    }), 201 if settlement_ids else 200
@@ -4,9 +4,11 @@ Service classes for Bill Splitting App
 This package contains business logic services:
 - sms_service: Twilio SMS integration for payment reminders
 - bill_calculator: Advanced bill splitting and balance calculations
+- cache: Redis cache-aside layer for read-heavy endpoints
 """
 
 from .sms_service import SMSService
 from .bill_calculator import BillCalculator
+from .cache import CacheService
 
-__all__ = ['SMSService', 'BillCalculator']
+__all__ = ['SMSService', 'BillCalculator', 'CacheService']
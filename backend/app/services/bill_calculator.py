@@ -1,11 +1,112 @@
-from decimal import Decimal, ROUND_HALF_UP
-from typing import Dict, List, Tuple, Optional
-from collections import defaultdict
-import heapq
+from decimal import Decimal
+from typing import Dict, Iterable, Iterator, List, Tuple, Optional
+from collections import Counter, defaultdict
 import logging
+from app.utils import allocate_cents, from_cents, split_cents_equally, to_cents
 
 logger = logging.getLogger(__name__)
 
+_ZERO = Decimal('0')
+_EPS = Decimal('0.01')  # 1 cent tolerance
+
+def _to_dec(value) -> Decimal:
+    """Convert a value to Decimal, passing Decimals through untouched"""
+    if isinstance(value, Decimal):
+        return value
+    return Decimal(str(value))
+
+def _paid_and_owed_cents(expenses: List[Dict]) -> Tuple[Dict[int, int], Dict[int, int]]:
+    """Sum each user's paid and owed amounts over active expenses, in integer cents"""
+    paid = defaultdict(int)
+    owed = defaultdict(int)
+
+    for expense in expenses:
+        if not expense.get('is_active', True):
+            continue
+
+        # Add to amount paid by payer
+        paid[expense['paid_by_id']] += to_cents(expense['amount'])
+
+        # Add to amounts owed by participants
+        for participant in expense.get('participants', []):
+            owed[participant['user_id']] += to_cents(participant['amount_owed'])
+
+    return paid, owed
+
+def _settle_cents(balances_cents: Iterable[Tuple[int, int]]) -> Iterator[Tuple[int, int, int]]:
+    """
+    Greedy two-pointer sweep over (user_id, net cents) pairs
+    Yields (debtor_id, creditor_id, cents) transfers as they are found
+    """
+    # Separate creditors (owed money) and debtors (owe money), each sorted
+    # largest amount first (ignore tiny amounts)
+    creditors = []
+    debtors = []
+    for user_id, cents in balances_cents:
+        if cents > 1:
+            creditors.append([user_id, cents])
+        elif cents < -1:
+            debtors.append([user_id, -cents])
+
+    creditors.sort(key=lambda entry: -entry[1])
+    debtors.sort(key=lambda entry: -entry[1])
+
+    # Sweep both lists once; each settlement clears at least one side, whose index then advances
+    ci = di = 0
+    while ci < len(creditors) and di < len(debtors):
+        creditor = creditors[ci]
+        debtor = debtors[di]
+
+        # Settlement amount is minimum of credit and debt
+        settlement_amount = min(creditor[1], debtor[1])
+        yield debtor[0], creditor[0], settlement_amount
+
+        # Update remaining balances, moving past any that are no longer significant
+        creditor[1] -= settlement_amount
+        debtor[1] -= settlement_amount
+
+        if creditor[1] <= 1:
+            ci += 1
+
+        if debtor[1] <= 1:
+            di += 1
+
+def _settlement_plan(balances_cents: Iterable[Tuple[int, int]], user_names: Dict[int, str]) -> Dict:
+    """Run the settlement sweep and format each transfer in the same pass"""
+    formatted_settlements = []
+    total_cents = 0
+
+    for from_id, to_id, cents in _settle_cents(balances_cents):
+        from_user = user_names.get(from_id, f"User {from_id}")
+        to_user = user_names.get(to_id, f"User {to_id}")
+        amount = from_cents(cents)
+
+        formatted_settlements.append({
+            'from_user_id': from_id,
+            'from_user_name': from_user,
+            'to_user_id': to_id,
+            'to_user_name': to_user,
+            'amount': amount,
+            'description': f"{from_user} pays ${amount:.2f} to {to_user}"
+        })
+
+        total_cents += cents
+
+    if not formatted_settlements:
+        return {
+            'settlements': [],
+            'summary': 'All balances are settled!',
+            'total_transactions': 0,
+            'total_amount_moving': _ZERO
+        }
+
+    return {
+        'settlements': formatted_settlements,
+        'summary': f"Settle all balances with {len(formatted_settlements)} transaction(s)",
+        'total_transactions': len(formatted_settlements),
+        'total_amount_moving': from_cents(total_cents)
+    }
+
 class BillCalculator:
     """
     Advanced bill splitting and balance calculation service
@@ -35,23 +136,12 @@ class BillCalculator:
         if total_amount <= 0:
             raise ValueError("Amount must be positive")
 
-        # Calculate amount per person
-        amount_per_person = total_amount / len(participant_ids)
-        rounded_amount = amount_per_person.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
-
-        # Distribute amounts
-        result = {}
-        total_assigned = Decimal('0')
-
-        # Assign rounded amounts to all but last person
-        for user_id in participant_ids[:-1]:
-            result[user_id] = rounded_amount
-            total_assigned += rounded_amount
-
-        # Last person gets remainder to ensure exact total
-        result[participant_ids[-1]] = total_amount - total_assigned
+        # Work in integer cents; the first `remainder` people absorb one extra cent each
+        shares = split_cents_equally(to_cents(total_amount), len(participant_ids))
 
-        return result
+        # At most two distinct shares, so build each Decimal once
+        amounts = {cents: from_cents(cents) for cents in set(shares)}
+        return {user_id: amounts[cents] for user_id, cents in zip(participant_ids, shares)}
 
     @staticmethod
     def split_by_exact_amounts(total_amount: Decimal, amounts: Dict[int, Decimal]) -> Dict[int, Decimal]:
@@ -71,7 +161,7 @@ class BillCalculator:
         calculated_total = sum(amounts.values())
 
         # Allow small rounding tolerance (1 cent)
-        if abs(calculated_total - total_amount) > Decimal('0.01'):
+        if abs(calculated_total - total_amount) > _EPS:
             raise ValueError(f"Sum of amounts ({calculated_total}) doesn't match total ({total_amount})")
 
         return amounts.copy()
@@ -94,24 +184,15 @@ class BillCalculator:
         total_percentage = sum(percentages.values())
 
         # Allow small tolerance for percentage sum
-        if abs(total_percentage - 100) > Decimal('0.01'):
+        if abs(total_percentage - 100) > _EPS:
             raise ValueError(f"Percentages sum to {total_percentage}, not 100")
 
-        result = {}
-        total_assigned = Decimal('0')
+        # Allocate integer cents by hundredths of a percent (largest remainder, exact total)
         user_ids = list(percentages.keys())
+        basis_points = [to_cents(percentages[user_id]) for user_id in user_ids]
+        shares = allocate_cents(to_cents(total_amount), basis_points)
 
-        # Calculate amounts for all but last person
-        for user_id in user_ids[:-1]:
-            percentage = percentages[user_id]
-            amount = (total_amount * percentage / 100).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
-            result[user_id] = amount
-            total_assigned += amount
-
-        # Last person gets remainder
-        result[user_ids[-1]] = total_amount - total_assigned
-
-        return result
+        return {user_id: from_cents(share) for user_id, share in zip(user_ids, shares)}
 
     @staticmethod
     def calculate_balances(expenses: List[Dict]) -> Dict[int, Dict]:
@@ -124,35 +205,24 @@ class BillCalculator:
         Returns:
             Dict mapping user_id to balance info
         """
-        balances = defaultdict(lambda: {'paid': Decimal('0'), 'owed': Decimal('0'), 'net': Decimal('0')})
-
-        for expense in expenses:
-            if not expense.get('is_active', True):
-                continue
-
-            paid_by_id = expense['paid_by_id']
-            amount = Decimal(str(expense['amount']))
-
-            # Add to amount paid by payer
-            balances[paid_by_id]['paid'] += amount
-
-            # Add to amounts owed by participants
-            for participant in expense.get('participants', []):
-                user_id = participant['user_id']
-                amount_owed = Decimal(str(participant['amount_owed']))
-                balances[user_id]['owed'] += amount_owed
+        # Accumulate in integer cents; convert to Decimal once per user at the end
+        paid, owed = _paid_and_owed_cents(expenses)
 
         # Calculate net balances
-        for user_id in balances:
-            balances[user_id]['net'] = balances[user_id]['paid'] - balances[user_id]['owed']
-
-        return dict(balances)
+        return {
+            user_id: {
+                'paid': from_cents(paid[user_id]),
+                'owed': from_cents(owed[user_id]),
+                'net': from_cents(paid[user_id] - owed[user_id])
+            }
+            for user_id in paid.keys() | owed.keys()
+        }
 
     @staticmethod
     def optimize_settlements(balances: Dict[int, Decimal]) -> List[Dict]:
         """
         Calculate optimal settlements to minimize number of transactions
-        Uses a greedy algorithm with heaps
+        Uses a greedy two-pointer sweep over creditors and debtors sorted by amount
 
         Args:
             balances: Dict mapping user_id to net balance (positive = owed money, negative = owes money)
@@ -163,51 +233,45 @@ class BillCalculator:
         if not balances:
             return []
 
-        # Separate creditors (owed money) and debtors (owe money)
-        creditors = []  # Max heap (amounts owed TO them)
-        debtors = []    # Min heap (amounts they owe, stored as negative)
-
-        for user_id, balance in balances.items():
-            if balance > Decimal('0.01'):  # Creditor (ignore tiny amounts)
-                heapq.heappush(creditors, (-balance, user_id))  # Negative for max heap
-            elif balance < -Decimal('0.01'):  # Debtor
-                heapq.heappush(debtors, (balance, user_id))  # Already negative
-
-        settlements = []
+        return [
+            {'from': from_id, 'to': to_id, 'amount': from_cents(cents)}
+            for from_id, to_id, cents in _settle_cents(
+                (user_id, to_cents(balance)) for user_id, balance in balances.items()
+            )
+        ]
 
-        # Process settlements
-        while creditors and debtors:
-            # Get largest creditor and debtor
-            neg_credit_amount, creditor_id = heapq.heappop(creditors)
-            debt_amount, debtor_id = heapq.heappop(debtors)
-
-            credit_amount = -neg_credit_amount  # Convert back to positive
-            debt_amount = -debt_amount  # Convert to positive amount owed
+    @staticmethod
+    def build_user_expense_index(expenses: List[Dict]) -> Dict[int, Dict[int, Optional[int]]]:
+        """
+        Index active expenses by the users involved in them
 
-            # Settlement amount is minimum of credit and debt
-            settlement_amount = min(credit_amount, debt_amount)
+        Args:
+            expenses: List of expense dictionaries
 
-            settlements.append({
-                'from': debtor_id,
-                'to': creditor_id,
-                'amount': settlement_amount
-            })
+        Returns:
+            Dict mapping user_id to {expense index: amount owed in cents}, where the
+            amount is None for a payer who is not also a participant
+        """
+        index = defaultdict(dict)
 
-            # Update remaining balances
-            remaining_credit = credit_amount - settlement_amount
-            remaining_debt = debt_amount - settlement_amount
+        for i, expense in enumerate(expenses):
+            if not expense.get('is_active', True):
+                continue
 
-            # Put remaining amounts back in heaps if significant
-            if remaining_credit > Decimal('0.01'):
-                heapq.heappush(creditors, (-remaining_credit, creditor_id))
+            index[expense['paid_by_id']][i] = None
 
-            if remaining_debt > Decimal('0.01'):
-                heapq.heappush(debtors, (-remaining_debt, debtor_id))
+            for participant in expense.get('participants', []):
+                index[participant['user_id']][i] = to_cents(participant['amount_owed'])
 
-        return settlements
+        return dict(index)
 
     @staticmethod
-    def calculate_user_debt_to_user(user1_id: int, user2_id: int, expenses: List[Dict]) -> Decimal:
+    def calculate_user_debt_to_user(
+        user1_id: int,
+        user2_id: int,
+        expenses: List[Dict],
+        index: Optional[Dict[int, Dict[int, Optional[int]]]] = None
+    ) -> Decimal:
         """
         Calculate how much user1 owes to user2 across all expenses
 
@@ -215,38 +279,34 @@ class BillCalculator:
             user1_id: ID of potential debtor
             user2_id: ID of potential creditor
             expenses: List of expense dictionaries
+            index: Result of build_user_expense_index(expenses); pass it when
+                computing several pairs so the expenses are only scanned once
 
         Returns:
             Decimal amount user1 owes to user2 (negative if user2 owes user1)
         """
-        net_debt = Decimal('0')
+        if index is None:
+            index = BillCalculator.build_user_expense_index(expenses)
 
-        for expense in expenses:
-            if not expense.get('is_active', True):
-                continue
+        user1_expenses = index.get(user1_id, {})
+        user2_expenses = index.get(user2_id, {})
+        net_debt = 0  # In cents
 
-            paid_by_id = expense['paid_by_id']
-            participants = expense.get('participants', [])
-
-            # Find if either user is involved in this expense
-            user1_participation = None
-            user2_participation = None
-
-            for participant in participants:
-                if participant['user_id'] == user1_id:
-                    user1_participation = participant
-                elif participant['user_id'] == user2_id:
-                    user2_participation = participant
+        # Only expenses involving both users can move money between them
+        for i in user1_expenses.keys() & user2_expenses.keys():
+            paid_by_id = expenses[i]['paid_by_id']
+            user1_owed = user1_expenses[i]
+            user2_owed = user2_expenses[i]
 
             # Case 1: User2 paid, User1 participated
-            if paid_by_id == user2_id and user1_participation:
-                net_debt += Decimal(str(user1_participation['amount_owed']))
+            if paid_by_id == user2_id and user1_owed is not None:
+                net_debt += user1_owed
 
-            # Case 2: User1 paid, User2 participated  
-            elif paid_by_id == user1_id and user2_participation:
-                net_debt -= Decimal(str(user2_participation['amount_owed']))
+            # Case 2: User1 paid, User2 participated
+            elif paid_by_id == user1_id and user2_owed is not None:
+                net_debt -= user2_owed
 
-        return net_debt
+        return from_cents(net_debt)
 
     @staticmethod
     def suggest_settlement_plan(balances: Dict[int, Decimal], user_names: Dict[int, str]) -> Dict:
@@ -260,42 +320,10 @@ class BillCalculator:
         Returns:
             Dict with settlement plan and summary
         """
-        settlements = BillCalculator.optimize_settlements(balances)
-
-        if not settlements:
-            return {
-                'settlements': [],
-                'summary': 'All balances are settled!',
-                'total_transactions': 0,
-                'total_amount_moving': Decimal('0')
-            }
-
-        # Format settlements with user names
-        formatted_settlements = []
-        total_amount = Decimal('0')
-
-        for settlement in settlements:
-            from_user = user_names.get(settlement['from'], f"User {settlement['from']}")
-            to_user = user_names.get(settlement['to'], f"User {settlement['to']}")
-            amount = settlement['amount']
-
-            formatted_settlements.append({
-                'from_user_id': settlement['from'],
-                'from_user_name': from_user,
-                'to_user_id': settlement['to'],
-                'to_user_name': to_user,
-                'amount': amount,
-                'description': f"{from_user} pays ${amount:.2f} to {to_user}"
-            })
-
-            total_amount += amount
-
-        return {
-            'settlements': formatted_settlements,
-            'summary': f"Settle all balances with {len(settlements)} transaction(s)",
-            'total_transactions': len(settlements),
-            'total_amount_moving': total_amount
-        }
+        return _settlement_plan(
+            ((user_id, to_cents(balance)) for user_id, balance in balances.items()),
+            user_names
+        )
 
     @staticmethod
     def validate_expense_split(total_amount: Decimal, split_data: Dict) -> Tuple[bool, Optional[str]]:
@@ -324,8 +352,8 @@ class BillCalculator:
                 if not amounts:
                     return False, "No amounts specified for exact split"
 
-                total_specified = sum(Decimal(str(amt)) for amt in amounts.values())
-                if abs(total_specified - total_amount) > Decimal('0.01'):
+                total_specified = sum(_to_dec(amt) for amt in amounts.values())
+                if abs(total_specified - total_amount) > _EPS:
                     return False, f"Amounts sum to ${total_specified}, expected ${total_amount}"
 
             elif split_method == 'percentage':
@@ -333,8 +361,8 @@ class BillCalculator:
                 if not percentages:
                     return False, "No percentages specified for percentage split"
 
-                total_percentage = sum(Decimal(str(pct)) for pct in percentages.values())
-                if abs(total_percentage - 100) > Decimal('0.01'):
+                total_percentage = sum(_to_dec(pct) for pct in percentages.values())
+                if abs(total_percentage - 100) > _EPS:
                     return False, f"Percentages sum to {total_percentage}%, expected 100%"
 
             else:
@@ -359,11 +387,11 @@ class BillCalculator:
         """
         if not expenses:
             return {
-                'total_expenses': Decimal('0'),
+                'total_expenses': _ZERO,
                 'expense_count': 0,
-                'average_expense': Decimal('0'),
-                'largest_expense': Decimal('0'),
-                'smallest_expense': Decimal('0'),
+                'average_expense': _ZERO,
+                'largest_expense': _ZERO,
+                'smallest_expense': _ZERO,
                 'most_active_payer': None,
                 'category_breakdown': {},
                 'monthly_trends': {}
@@ -374,38 +402,43 @@ class BillCalculator:
         if not active_expenses:
             return BillCalculator.calculate_group_statistics([], participants)
 
-        # Basic statistics
-        amounts = [Decimal(str(exp['amount'])) for exp in active_expenses]
-        total_expenses = sum(amounts)
+        # Basic statistics, in integer cents
+        amounts = [to_cents(exp['amount']) for exp in active_expenses]
+        total_cents = sum(amounts)
         expense_count = len(active_expenses)
-        average_expense = total_expenses / expense_count if expense_count > 0 else Decimal('0')
+        average_expense = from_cents(total_cents) / expense_count if expense_count > 0 else _ZERO
 
         # Payer statistics
-        payer_counts = defaultdict(int)
-        payer_amounts = defaultdict(Decimal)
+        payer_counts = Counter()
+        payer_amounts = Counter()
+
+        # Category breakdown
+        category_counts = Counter()
+        category_amounts = Counter()
 
-        for expense in active_expenses:
+        for expense, cents in zip(active_expenses, amounts):
             payer_id = expense['paid_by_id']
             payer_counts[payer_id] += 1
-            payer_amounts[payer_id] += Decimal(str(expense['amount']))
-
-        most_active_payer = max(payer_counts.items(), key=lambda x: x[1])[0] if payer_counts else None
+            payer_amounts[payer_id] += cents
 
-        # Category breakdown
-        category_breakdown = defaultdict(lambda: {'count': 0, 'amount': Decimal('0')})
-
-        for expense in active_expenses:
             category = expense.get('category', 'general')
-            category_breakdown[category]['count'] += 1
-            category_breakdown[category]['amount'] += Decimal(str(expense['amount']))
+            category_counts[category] += 1
+            category_amounts[category] += cents
+
+        most_active_payer = payer_counts.most_common(1)[0][0] if payer_counts else None
 
         return {
-            'total_expenses': total_expenses,
+            'total_expenses': from_cents(total_cents),
             'expense_count': expense_count,
             'average_expense': average_expense,
-            'largest_expense': max(amounts),
-            'smallest_expense': min(amounts),
+            'largest_expense': from_cents(max(amounts)),
+            'smallest_expense': from_cents(min(amounts)),
             'most_active_payer': most_active_payer,
-            'payer_statistics': dict(payer_amounts),
-            'category_breakdown': dict(category_breakdown),
+            'payer_statistics': {
+                payer_id: from_cents(cents) for payer_id, cents in payer_amounts.items()
+            },
+            'category_breakdown': {
+                category: {'count': category_counts[category], 'amount': from_cents(cents)}
+                for category, cents in category_amounts.items()
+            },
         }
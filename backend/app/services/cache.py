@@ -0,0 +1,109 @@
+import logging
+from typing import Any, Iterable, Optional
+
+import orjson
+import redis
+
+from app.utils import orjson_dumps
+
+logger = logging.getLogger(__name__)
+
+def group_key(group_id: int) -> str:
+    """Cache key for the full group payload (members and balances)"""
+    return f'group:{group_id}:dict:v1'
+
+def group_balances_key(group_id: int) -> str:
+    """Cache key for a group's member balances"""
+    return f'group:{group_id}:balances:v1'
+
+def user_groups_key(user_id: int) -> str:
+    """Cache key for a user's serialized groups list"""
+    return f'user:{user_id}:groups:v1'
+
+class CacheService:
+    """
+    Redis cache-aside helper for read-heavy API payloads
+
+    Caching is disabled (every lookup misses) when REDIS_URL is not configured,
+    and Redis errors are logged and treated as misses so requests never fail on
+    the cache.
+    """
+
+    def __init__(self):
+        self.client = None
+        self.default_ttl = 120
+
+    def init_app(self, app):
+        """Connect to Redis using the app configuration"""
+        redis_url = app.config.get('REDIS_URL')
+        self.default_ttl = app.config.get('CACHE_TTL', self.default_ttl)
+        self.client = redis.Redis.from_url(redis_url) if redis_url else None
+
+    def get_raw(self, key: str) -> Optional[bytes]:
+        """Get cached bytes, or None on miss"""
+        if not self.client:
+            return None
+
+        try:
+            return self.client.get(key)
+        except redis.RedisError as e:
+            logger.warning(f"Cache get failed for {key}: {str(e)}")
+            return None
+
+    def set_raw(self, key: str, value: bytes, ttl: Optional[int] = None) -> None:
+        """Cache bytes with a TTL in seconds"""
+        if not self.client:
+            return
+
+        try:
+            self.client.setex(key, ttl or self.default_ttl, value)
+        except redis.RedisError as e:
+            logger.warning(f"Cache set failed for {key}: {str(e)}")
+
+    def get(self, key: str) -> Optional[Any]:
+        """Get a cached JSON payload, or None on miss"""
+        value = self.get_raw(key)
+        return orjson.loads(value) if value is not None else None
+
+    def set(self, key: str, value: Any, ttl: Optional[int] = None) -> None:
+        """Cache a JSON-serializable payload with a TTL in seconds"""
+        if self.client:
+            self.set_raw(key, orjson_dumps(value), ttl)
+
+    def delete(self, *keys: str) -> None:
+        """Remove keys from the cache"""
+        if not self.client or not keys:
+            return
+
+        try:
+            self.client.delete(*keys)
+        except redis.RedisError as e:
+            logger.warning(f"Cache delete failed for {keys}: {str(e)}")
+
+    def invalidate_groups(self, group_ids: Iterable[int], user_ids: Iterable[int] = ()) -> None:
+        """
+        Drop cached payloads for the given groups after a write, along with the
+        groups lists of their active members and of any extra user_ids (e.g. a
+        member who was just removed)
+        """
+        if not self.client:
+            return
+
+        # Imported here: the models import app.extensions, which imports this module
+        from app.extensions import db
+        from app.models.group import GroupMembership
+
+        group_ids = list(group_ids)
+        member_ids = set(user_ids)
+        if group_ids:
+            member_ids.update(db.session.execute(
+                db.select(GroupMembership.user_id).where(
+                    GroupMembership.group_id.in_(group_ids),
+                    GroupMembership.is_active == True
+                )
+            ).scalars())
+
+        keys = [user_groups_key(user_id) for user_id in member_ids]
+        for group_id in group_ids:
+            keys.extend((group_key(group_id), group_balances_key(group_id)))
+        self.delete(*keys)
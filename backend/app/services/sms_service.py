@@ -1,11 +1,50 @@
 import os
+import re
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from requests.adapters import HTTPAdapter
 from twilio.rest import Client
-from twilio.base.exceptions import TwilioException
+from twilio.base.exceptions import TwilioException, TwilioRestException
 import logging
-from typing import Dict, Optional
+from typing import Dict, List, Optional
 
 logger = logging.getLogger(__name__)
 
+_NONDIGIT = re.compile(r'\D+')
+
+# Concurrent sends in bulk reminder runs, and the matching number of pooled
+# connections kept open to the Twilio API
+SMS_POOL_SIZE = 16
+
+# Seconds to wait on the Twilio Messages API before giving up on a send
+SMS_TIMEOUT = 10
+
+# Payment reminder templates by message type
+_REMINDER_TEMPLATES = {
+    'friendly': (
+        "Hi {user_name}! Friendly reminder that you have an outstanding balance of "
+        "{amount} in the '{group_name}' group. "
+        "Please settle when convenient. Thanks! - {sender_name} 💰"
+    ),
+    'urgent': (
+        "Hi {user_name}, you have an outstanding balance of {amount} "
+        "in '{group_name}'. Please settle this amount soon. "
+        "Contact {sender_name} if you have any questions. 🔔"
+    ),
+    'final': (
+        "FINAL NOTICE: {user_name}, your outstanding balance of {amount} "
+        "in '{group_name}' needs immediate attention. "
+        "Please contact {sender_name} to resolve this matter. ⚠️"
+    ),
+}
+
+# Default friendly message for unknown types
+_DEFAULT_REMINDER_TEMPLATE = (
+    "Hi {user_name}! You have a balance of {amount} "
+    "in '{group_name}'. Please settle when you can. - {sender_name}"
+)
+
 class SMSService:
     """SMS service using Twilio API for sending payment reminders"""
 
@@ -21,10 +60,23 @@ class SMSService:
         else:
             self.client = Client(self.account_sid, self.auth_token)
 
-    def _format_phone_number(self, phone: str) -> str:
-        """Format phone number for Twilio (E.164 format)"""
+            # Sends go straight to the REST endpoint over one pooled session, skipping
+            # the SDK's per-call wrapping; the SDK client is the fallback and serves status lookups
+            self._sms_url = (
+                f"https://api.twilio.com/2010-04-01/Accounts/{self.account_sid}/Messages.json"
+            )
+            self._session = requests.Session()
+            self._session.auth = (self.account_sid, self.auth_token)
+
+            # Keep enough warm TLS connections for every bulk-send worker
+            self._session.mount('https://', HTTPAdapter(pool_maxsize=SMS_POOL_SIZE))
+
+    @staticmethod
+    @lru_cache(maxsize=4096)
+    def _format_phone_number(phone: str) -> str:
+        """Format phone number for Twilio (E.164 format), cached per distinct input"""
         # Remove all non-digit characters
-        digits_only = ''.join(filter(str.isdigit, phone))
+        digits_only = _NONDIGIT.sub('', phone)
 
         # Add country code if not present (assuming US/Canada +1)
         if len(digits_only) == 10:
@@ -36,6 +88,62 @@ class SMSService:
         else:
             return f"+{digits_only}"
 
+    def _send_sms(self, to_number: str, body: str) -> str:
+        """
+        Send one SMS, directly over the pooled session and through the SDK client if that fails
+
+        Returns:
+            The Twilio message SID
+
+        Raises:
+            TwilioException: If the SDK fallback fails too
+        """
+        try:
+            return self._post_sms(to_number, body)
+        except (requests.RequestException, TwilioRestException, ValueError, KeyError) as e:
+            logger.warning(f"Direct Twilio send to {to_number} failed ({str(e)}), retrying through the SDK")
+
+        message = self.client.messages.create(
+            body=body,
+            from_=self.from_number,
+            to=to_number
+        )
+        return message.sid
+
+    def _post_sms(self, to_number: str, body: str) -> str:
+        """
+        Send one SMS by POSTing to the Twilio Messages API
+
+        Returns:
+            The Twilio message SID
+
+        Raises:
+            TwilioRestException: If Twilio rejects the message
+            requests.RequestException: On transport errors
+        """
+        response = self._session.post(
+            self._sms_url,
+            data={'From': self.from_number, 'To': to_number, 'Body': body},
+            timeout=SMS_TIMEOUT
+        )
+        if not response.ok:
+            # Twilio errors carry a JSON body; gateway errors may be HTML or empty
+            try:
+                payload = response.json()
+            except ValueError:
+                payload = {}
+            if not isinstance(payload, dict):
+                payload = {}
+
+            raise TwilioRestException(
+                response.status_code, self._sms_url,
+                msg=payload.get('message') or response.reason,
+                code=payload.get('code'),
+                method='POST'
+            )
+
+        return response.json()['sid']
+
     def _generate_payment_reminder_message(
         self, 
         user_name: str, 
@@ -50,35 +158,13 @@ class SMSService:
         if custom_message:
             return custom_message
 
-        formatted_amount = f"${amount:.2f}"
-
-        if message_type == 'friendly':
-            return (
-                f"Hi {user_name}! Friendly reminder that you have an outstanding balance of "
-                f"{formatted_amount} in the '{group_name}' group. "
-                f"Please settle when convenient. Thanks! - {sender_name} 💰"
-            )
-
-        elif message_type == 'urgent':
-            return (
-                f"Hi {user_name}, you have an outstanding balance of {formatted_amount} "
-                f"in '{group_name}'. Please settle this amount soon. "
-                f"Contact {sender_name} if you have any questions. 🔔"
-            )
-
-        elif message_type == 'final':
-            return (
-                f"FINAL NOTICE: {user_name}, your outstanding balance of {formatted_amount} "
-                f"in '{group_name}' needs immediate attention. "
-                f"Please contact {sender_name} to resolve this matter. ⚠️"
-            )
-
-        else:
-            # Default friendly message
-            return (
-                f"Hi {user_name}! You have a balance of {formatted_amount} "
-                f"in '{group_name}'. Please settle when you can. - {sender_name}"
-            )
+        template = _REMINDER_TEMPLATES.get(message_type, _DEFAULT_REMINDER_TEMPLATE)
+        return template.format(
+            user_name=user_name,
+            group_name=group_name,
+            amount=f"${amount:.2f}",
+            sender_name=sender_name
+        )
 
     def send_payment_reminder(
         self,
@@ -130,17 +216,13 @@ class SMSService:
                 message_body = message_body[:317] + "..."
 
             # Send SMS
-            message = self.client.messages.create(
-                body=message_body,
-                from_=self.from_number,
-                to=to_number
-            )
+            sms_id = self._send_sms(to_number, message_body)
 
-            logger.info(f"Payment reminder SMS sent successfully to {to_number}, SID: {message.sid}")
+            logger.info(f"Payment reminder SMS sent successfully to {to_number}, SID: {sms_id}")
 
             return {
                 'success': True,
-                'sms_id': message.sid,
+                'sms_id': sms_id,
                 'message_body': message_body,
                 'to_number': to_number
             }
@@ -159,6 +241,24 @@ class SMSService:
                 'error_message': f"Unexpected error: {str(e)}"
             }
 
+    def send_bulk_payment_reminders(self, reminders: List[Dict], max_workers: int = SMS_POOL_SIZE) -> List[Dict]:
+        """
+        Send several payment reminder SMS concurrently
+
+        Args:
+            reminders: List of send_payment_reminder keyword arguments, one per recipient
+            max_workers: Maximum number of requests in flight to Twilio at once
+
+        Returns:
+            List of result dicts, in the same order as reminders
+        """
+        if not reminders:
+            return []
+
+        # Each send is a blocking HTTPS round-trip, so overlap them instead of paying for each in turn
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(reminders))) as executor:
+            return list(executor.map(lambda kwargs: self.send_payment_reminder(**kwargs), reminders))
+
     def send_settlement_confirmation(
         self,
         payer_name: str,
@@ -183,17 +283,13 @@ class SMSService:
                 f"in '{group_name}' has been recorded. Thank you for settling up! ✅"
             )
 
-            message = self.client.messages.create(
-                body=message_body,
-                from_=self.from_number,
-                to=to_number
-            )
+            sms_id = self._send_sms(to_number, message_body)
 
-            logger.info(f"Settlement confirmation SMS sent to {to_number}, SID: {message.sid}")
+            logger.info(f"Settlement confirmation SMS sent to {to_number}, SID: {sms_id}")
 
             return {
                 'success': True,
-                'sms_id': message.sid,
+                'sms_id': sms_id,
                 'message_body': message_body
             }
 
@@ -230,17 +326,13 @@ class SMSService:
                 f"Check the app for details. 📝"
             )
 
-            message = self.client.messages.create(
-                body=message_body,
-                from_=self.from_number,
-                to=to_number
-            )
+            sms_id = self._send_sms(to_number, message_body)
 
-            logger.info(f"Expense notification SMS sent to {to_number}, SID: {message.sid}")
+            logger.info(f"Expense notification SMS sent to {to_number}, SID: {sms_id}")
 
             return {
                 'success': True,
-                'sms_id': message.sid,
+                'sms_id': sms_id,
                 'message_body': message_body
             }
 
@@ -262,17 +354,13 @@ class SMSService:
         try:
             to_number = self._format_phone_number(phone_number)
 
-            message = self.client.messages.create(
-                body=message,
-                from_=self.from_number,
-                to=to_number
-            )
+            sms_id = self._send_sms(to_number, message)
 
-            logger.info(f"Test SMS sent to {to_number}, SID: {message.sid}")
+            logger.info(f"Test SMS sent to {to_number}, SID: {sms_id}")
 
             return {
                 'success': True,
-                'sms_id': message.sid,
+                'sms_id': sms_id,
                 'message_body': message
             }
 
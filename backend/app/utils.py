@@ -0,0 +1,84 @@
+"""
+Shared helpers for Bill Splitting App
+"""
+
+from datetime import datetime, timezone
+from decimal import Decimal, ROUND_HALF_UP
+from functools import lru_cache
+import orjson
+
+try:
+    from ciso8601 import parse_datetime as _parse_datetime
+except ImportError:  # Fall back to the stdlib parser
+    def _parse_datetime(value):
+        if value.endswith('Z'):
+            value = value[:-1] + '+00:00'
+        return datetime.fromisoformat(value)
+
+@lru_cache(maxsize=2048)
+def parse_iso_datetime(value):
+    """Parse an ISO 8601 timestamp (identical strings from bulk imports hit the cache)"""
+    return _parse_datetime(value)
+
+def to_naive_utc(value):
+    """Convert an aware datetime to naive UTC, matching the naive UTC timestamps stored by the models"""
+    if value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+def to_cents(amount):
+    """Convert an amount (Decimal, float, int or str) to integer cents, rounding half up"""
+    if isinstance(amount, int):
+        return amount * 100
+    if isinstance(amount, float):
+        # Stored amounts have at most 2 places, so the scaled float is an integer up to rounding error
+        scaled = amount * 100
+        cents = round(scaled)
+        if abs(scaled - cents) < 1e-6:
+            return cents
+        amount = str(amount)
+    if not isinstance(amount, Decimal):
+        amount = Decimal(amount)
+    return int(amount.scaleb(2).to_integral_value(rounding=ROUND_HALF_UP))
+
+def from_cents(cents):
+    """Convert integer cents back to a 2-place Decimal"""
+    return Decimal(cents).scaleb(-2)
+
+def split_cents_equally(total_cents, count):
+    """Split total_cents into count shares; the first `remainder` shares absorb one extra cent each"""
+    share, remainder = divmod(total_cents, count)
+    return [share + 1 if i < remainder else share for i in range(count)]
+
+def allocate_cents(total_cents, weights):
+    """
+    Split total_cents in proportion to integer weights, handing leftover cents
+    to the largest fractional remainders so the shares sum exactly to the total
+    """
+    weight_total = sum(weights)
+    shares = []
+    remainders = []
+    for weight in weights:
+        share, remainder = divmod(total_cents * weight, weight_total)
+        shares.append(share)
+        remainders.append(remainder)
+
+    leftover = total_cents - sum(shares)
+    by_remainder = sorted(range(len(weights)), key=lambda i: remainders[i], reverse=True)
+    for i in by_remainder[:leftover]:
+        shares[i] += 1
+
+    return shares
+
+def _orjson_default(obj):
+    """Serialize types orjson does not handle natively"""
+    if isinstance(obj, Decimal):
+        return str(obj)
+    raise TypeError(f'Object of type {type(obj).__name__} is not JSON serializable')
+
+# Balances are keyed by integer user IDs
+ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS
+
+def orjson_dumps(obj):
+    """Serialize obj to JSON bytes with the app's orjson settings"""
+    return orjson.dumps(obj, default=_orjson_default, option=ORJSON_OPTIONS)
@@ -12,8 +12,15 @@ class Config:
     SQLALCHEMY_ENGINE_OPTIONS = {
         'pool_pre_ping': True,
         'pool_recycle': 300,
+        'pool_size': int(os.environ.get('DB_POOL_SIZE', 20)),
+        'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 10)),
+        'query_cache_size': 1200,
+        'executemany_mode': 'values_plus_batch',  # psycopg2 multi-row INSERT/UPDATE batching
     }
 
+    # Password hashing cost (bcrypt work factor, 2^rounds iterations)
+    BCRYPT_LOG_ROUNDS = int(os.environ.get('BCRYPT_LOG_ROUNDS', 10))
+
     # JWT Config
     JWT_SECRET_KEY = os.environ.get('JWT_SECRET_KEY') or 'jwt-secret-string'
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(hours=1)
@@ -24,6 +31,10 @@ class Config:
     TWILIO_AUTH_TOKEN = os.environ.get('TWILIO_AUTH_TOKEN')
     TWILIO_PHONE_NUMBER = os.environ.get('TWILIO_PHONE_NUMBER')
 
+    # Redis cache Config (caching is disabled when REDIS_URL is unset)
+    REDIS_URL = os.environ.get('REDIS_URL')
+    CACHE_TTL = int(os.environ.get('CACHE_TTL', 120))
+
     # CORS Config
     CORS_ORIGINS = os.environ.get('CORS_ORIGINS', 'http://localhost:3000').split(',')
 
@@ -35,7 +46,9 @@ class ProductionConfig(Config):
 
 class TestingConfig(Config):
     TESTING = True
+    BCRYPT_LOG_ROUNDS = 4
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    SQLALCHEMY_ENGINE_OPTIONS = {}  # Pool and psycopg2 options don't apply to SQLite
 
 config = {
     'development': DevelopmentConfig,
@@ -0,0 +1,49 @@
+import pytest
+from app import create_app
+from app.extensions import db
+
+
+@pytest.fixture
+def app():
+    """App on an in-memory SQLite database (TestingConfig), created fresh per test"""
+    app = create_app('testing')
+
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def make_user(client):
+    """Register a user; returns (user_id, auth headers)"""
+    def _make_user(index):
+        response = client.post('/api/auth/register', json={
+            'email': f'user{index}@example.com',
+            'phone_number': f'555000{index:04d}',
+            'full_name': f'User {index}',
+            'password': 'Passw0rd!'
+        })
+        assert response.status_code == 201, response.get_json()
+        data = response.get_json()
+        return data['user']['id'], {'Authorization': f"Bearer {data['access_token']}"}
+
+    return _make_user
+
+
+@pytest.fixture
+def group(client, make_user):
+    """A group of three users; returns (group_id, [(user_id, headers), ...]) with the admin first"""
+    users = [make_user(i) for i in range(3)]
+    response = client.post('/api/groups', headers=users[0][1], json={
+        'name': 'Flat',
+        'member_emails': ['user1@example.com', 'user2@example.com']
+    })
+    assert response.status_code == 201, response.get_json()
+    return response.get_json()['group']['id'], users
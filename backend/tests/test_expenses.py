@@ -0,0 +1,158 @@
+from decimal import Decimal
+
+from app.extensions import db
+from app.models.expense import ExpenseParticipant
+from app.models.group import Group
+
+
+def create_expense(client, headers, **data):
+    return client.post('/api/expenses', json=data, headers=headers, query_string={'include': 'full'})
+
+
+def owed_amounts(response):
+    return [p['amount_owed'] for p in response.get_json()['expense']['participants']]
+
+
+def test_equal_split_gives_extra_cents_to_first_participants(client, group):
+    group_id, users = group
+    user_ids = [user_id for user_id, _ in users]
+
+    response = create_expense(
+        client, users[0][1], title='Dinner', amount=10, group_id=group_id,
+        paid_by_id=user_ids[0], split_method='equal', participant_ids=user_ids
+    )
+
+    assert response.status_code == 201
+    assert owed_amounts(response) == [3.34, 3.33, 3.33]
+
+
+def test_percentage_split_uses_largest_remainder(client, group):
+    group_id, users = group
+    user_ids = [user_id for user_id, _ in users]
+
+    response = create_expense(
+        client, users[0][1], title='Rent', amount='100.01', group_id=group_id,
+        paid_by_id=user_ids[0], split_method='percentage',
+        percentages={str(user_ids[0]): 33.33, str(user_ids[1]): 33.33, str(user_ids[2]): 33.34}
+    )
+
+    assert response.status_code == 201
+    amounts = owed_amounts(response)
+    assert amounts == [33.33, 33.33, 33.35]
+    assert sum(Decimal(str(a)) for a in amounts) == Decimal('100.01')
+
+
+def test_exact_split_keeps_given_amounts(client, group):
+    group_id, users = group
+    user_ids = [user_id for user_id, _ in users]
+
+    response = create_expense(
+        client, users[0][1], title='Taxi', amount=10, group_id=group_id,
+        paid_by_id=user_ids[0], split_method='exact',
+        exact_amounts={str(user_ids[1]): 4.5, str(user_ids[2]): 5.5}
+    )
+
+    assert response.status_code == 201
+    assert owed_amounts(response) == [4.5, 5.5]
+
+
+def test_exact_split_must_match_total(client, group):
+    group_id, users = group
+    user_ids = [user_id for user_id, _ in users]
+
+    response = create_expense(
+        client, users[0][1], title='Taxi', amount=10, group_id=group_id,
+        paid_by_id=user_ids[0], split_method='exact',
+        exact_amounts={str(user_ids[1]): 4.5, str(user_ids[2]): 4.5}
+    )
+
+    assert response.status_code == 400
+    assert ExpenseParticipant.query.count() == 0
+
+
+def test_string_user_ids_are_accepted(client, group):
+    group_id, users = group
+    user_ids = [str(user_id) for user_id, _ in users]
+
+    response = create_expense(
+        client, users[0][1], title='Snacks', amount=9, group_id=group_id,
+        paid_by_id=user_ids[0], split_method='equal', participant_ids=user_ids
+    )
+
+    assert response.status_code == 201
+    assert owed_amounts(response) == [3.0, 3.0, 3.0]
+
+
+def test_invalid_participant_ids_are_rejected(client, group):
+    group_id, users = group
+
+    response = create_expense(
+        client, users[0][1], title='Snacks', amount=9, group_id=group_id,
+        paid_by_id=users[0][0], split_method='equal', participant_ids=[{'id': 1}]
+    )
+
+    assert response.status_code == 400
+
+
+def test_non_member_payer_is_rejected(client, group, make_user):
+    group_id, users = group
+    outsider_id, _ = make_user(9)
+
+    response = create_expense(
+        client, users[0][1], title='Snacks', amount=9, group_id=group_id,
+        paid_by_id=outsider_id, split_method='equal', participant_ids=[users[0][0]]
+    )
+
+    assert response.status_code == 400
+
+
+def test_group_total_tracks_expense_writes(client, group):
+    group_id, users = group
+    headers = users[0][1]
+
+    response = create_expense(
+        client, headers, title='Dinner', amount='12.34', group_id=group_id,
+        paid_by_id=users[0][0], split_method='equal', participant_ids=[users[0][0]]
+    )
+    expense_id = response.get_json()['expense']['id']
+    assert db.session.get(Group, group_id).total_expenses_cents == 1234
+
+    client.put(f'/api/expenses/{expense_id}', json={'amount': 20}, headers=headers)
+    db.session.expire_all()
+    assert db.session.get(Group, group_id).total_expenses_cents == 2000
+
+    client.delete(f'/api/expenses/{expense_id}', headers=headers)
+    db.session.expire_all()
+    assert db.session.get(Group, group_id).total_expenses_cents == 0
+
+
+def test_settling_twice_is_rejected(client, group):
+    group_id, users = group
+    user_ids = [user_id for user_id, _ in users]
+
+    response = create_expense(
+        client, users[0][1], title='Dinner', amount=30, group_id=group_id,
+        paid_by_id=user_ids[0], split_method='equal', participant_ids=user_ids
+    )
+    expense_id = response.get_json()['expense']['id']
+
+    first = client.post(f'/api/expenses/{expense_id}/settle', json={'create_settlement': True}, headers=users[1][1])
+    second = client.post(f'/api/expenses/{expense_id}/settle', json={'create_settlement': True}, headers=users[1][1])
+
+    assert first.status_code == 200
+    assert second.status_code == 400
+    assert second.get_json()['error'] == 'Your participation is already marked as settled'
+
+
+def test_settling_requires_participation(client, group):
+    group_id, users = group
+
+    response = create_expense(
+        client, users[0][1], title='Dinner', amount=30, group_id=group_id,
+        paid_by_id=users[0][0], split_method='equal', participant_ids=[users[0][0], users[1][0]]
+    )
+    expense_id = response.get_json()['expense']['id']
+
+    response = client.post(f'/api/expenses/{expense_id}/settle', json={}, headers=users[2][1])
+
+    assert response.status_code == 404
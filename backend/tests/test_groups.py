@@ -0,0 +1,95 @@
+from app.extensions import db
+from app.models.group import Group
+from app.models.settlement import Settlement
+
+
+def test_create_group_requires_name(client, make_user):
+    _, headers = make_user(0)
+
+    response = client.post('/api/groups', json={'name': '   '}, headers=headers)
+
+    assert response.status_code == 400
+    assert response.get_json()['error'] == 'Group name is required'
+
+
+def test_add_member_rejects_invalid_role(client, group, make_user):
+    group_id, users = group
+    make_user(5)
+
+    response = client.post(
+        f'/api/groups/{group_id}/members',
+        json={'email': 'user5@example.com', 'role': 'owner'},
+        headers=users[0][1]
+    )
+
+    assert response.status_code == 400
+
+
+def test_groups_cursor_pagination(client, make_user):
+    _, headers = make_user(0)
+    group_ids = [
+        client.post('/api/groups', json={'name': f'Group {i}'}, headers=headers).get_json()['group']['id']
+        for i in range(3)
+    ]
+
+    first = client.get('/api/groups', query_string={'limit': 2}, headers=headers).get_json()
+    assert [g['id'] for g in first['groups']] == group_ids[:2]
+    assert first['next_cursor'] == group_ids[1]
+
+    second = client.get(
+        '/api/groups', query_string={'limit': 2, 'cursor': first['next_cursor']}, headers=headers
+    ).get_json()
+    assert [g['id'] for g in second['groups']] == group_ids[2:]
+    assert second['next_cursor'] is None
+
+    everything = client.get('/api/groups', headers=headers).get_json()
+    assert [g['id'] for g in everything['groups']] == group_ids
+    assert 'next_cursor' not in everything
+
+
+def test_settle_up_is_idempotent(client, group):
+    group_id, users = group
+    user_ids = [user_id for user_id, _ in users]
+    headers = users[0][1]
+
+    client.post('/api/expenses', headers=headers, json={
+        'title': 'Dinner', 'amount': 10, 'group_id': group_id,
+        'paid_by_id': user_ids[0], 'split_method': 'equal', 'participant_ids': user_ids
+    })
+
+    first = client.post(f'/api/groups/{group_id}/settle-up', json={}, headers=headers)
+    assert first.status_code == 201
+    transfers = {(s['from_user_id'], s['to_user_id'], s['amount']) for s in first.get_json()['settlements']}
+    assert transfers == {(user_ids[1], user_ids[0], 3.33), (user_ids[2], user_ids[0], 3.33)}
+
+    second = client.post(f'/api/groups/{group_id}/settle-up', json={}, headers=headers)
+    assert second.status_code == 200
+    assert second.get_json()['settlements'] == []
+    assert Settlement.query.count() == 2
+
+
+def test_settle_up_requires_membership(client, group, make_user):
+    group_id, _ = group
+    _, outsider_headers = make_user(9)
+
+    response = client.post(f'/api/groups/{group_id}/settle-up', json={}, headers=outsider_headers)
+
+    assert response.status_code == 404
+
+
+def test_backfill_group_totals(app, client, group):
+    group_id, users = group
+
+    client.post('/api/expenses', headers=users[0][1], json={
+        'title': 'Dinner', 'amount': '45.50', 'group_id': group_id,
+        'paid_by_id': users[0][0], 'split_method': 'equal', 'participant_ids': [users[0][0]]
+    })
+    db.session.execute(db.update(Group).values(total_expenses_cents=0))
+    db.session.commit()
+
+    result = app.test_cli_runner().invoke(args=['backfill-group-totals'])
+
+    assert result.exit_code == 0, result.output
+    assert 'Updated expense totals for 1 group(s)' in result.output
+    db.session.expire_all()
+    assert db.session.get(Group, group_id).total_expenses_cents == 4550
@@ -79,16 +79,17 @@ export const groupService = {
   removeMember: (groupId, userId) => api.delete(`/groups/${groupId}/members/${userId}`),
   updateMemberRole: (groupId, userId, roleData) => api.put(`/groups/${groupId}/members/${userId}/role`, roleData),
   getGroupBalance: (groupId) => api.get(`/groups/${groupId}/balance`),
+  settleUpGroup: (groupId, settleUpData = {}) => api.post(`/groups/${groupId}/settle-up`, settleUpData),
 }
 
 // Expense Service
 export const expenseService = {
   getGroupExpenses: (groupId, params = {}) => api.get(`/expenses/group/${groupId}`, { params }),
   getExpenseDetails: (expenseId) => api.get(`/expenses/${expenseId}`),
-  createExpense: (expenseData) => api.post('/expenses', expenseData),
-  updateExpense: (expenseId, expenseData) => api.put(`/expenses/${expenseId}`, expenseData),
+  createExpense: (expenseData) => api.post('/expenses', expenseData, { params: { include: 'full' } }),
+  updateExpense: (expenseId, expenseData) => api.put(`/expenses/${expenseId}`, expenseData, { params: { include: 'full' } }),
   deleteExpense: (expenseId) => api.delete(`/expenses/${expenseId}`),
-  settleExpenseParticipation: (expenseId, settlementData) => api.post(`/expenses/${expenseId}/settle`, settlementData),
+  settleExpenseParticipation: (expenseId, settlementData) => api.post(`/expenses/${expenseId}/settle`, settlementData, { params: { include: 'full' } }),
   getGroupExpenseStatistics: (groupId, params = {}) => api.get(`/expenses/statistics/group/${groupId}`, { params }),
 }
 